@@ -0,0 +1,314 @@
+"""
+FastAPI application. Served by uvicorn as app.api:app; the launcher in
+app.main never imports this module so it can start without FastAPI or
+pandas.
+"""
+
+import os
+from functools import lru_cache
+
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+import pandas as pd
+
+from app.formats import FORMATS, FormatName, encode_table, negotiate_format
+from app.settings import DATA_PATH, SNAPSHOT_ENV, STORE_LOCATIONS_PATH
+
+app = FastAPI()
+
+
+@lru_cache(maxsize=1)
+def _snapshot_reader():
+	from logic.snapshot import SnapshotReader
+
+	root = os.environ.get(SNAPSHOT_ENV)
+	return SnapshotReader(root) if root else None
+
+
+def _snapshot_table(name: str, version: str | None = None) -> pd.DataFrame:
+	"""
+	Reads a snapshot table. Pass the version from one refresh() when a
+	request reads several tables, so a swap in between cannot mix versions.
+	"""
+	from logic.snapshot import read_table
+
+	reader = _snapshot_reader()
+	try:
+		if version is None:
+			return reader.table(name)
+		return read_table(reader.root, name, version)
+	except FileNotFoundError as e:
+		raise HTTPException(status_code=503, detail=str(e))
+
+
+def _snapshot_version() -> str:
+	reader = _snapshot_reader()
+	reader.refresh()
+	if reader.version is None:
+		raise HTTPException(status_code=503, detail=f"No snapshot found in {reader.root}")
+	return reader.version
+
+
+@app.get("/")
+def read_root():
+	return {"message": "Deadstock Redistribution API — use /data to preview dataset"}
+
+
+def _json_records(df: pd.DataFrame) -> list:
+	# Periods (Year_Month) have no JSON form; NaN (e.g. the missing side of a
+	# diff) is not valid JSON
+	periods = {col: str for col, dtype in df.dtypes.items() if isinstance(dtype, pd.PeriodDtype)}
+	df = df.astype(periods) if periods else df
+	return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+@app.get("/data")
+def get_data_preview(n: int = 10):
+	if _snapshot_reader() is not None:
+		df = _snapshot_table("inventory")
+		return {"rows": len(df), "columns": list(df.columns), "preview": _json_records(df.head(n))}
+
+	data_path = DATA_PATH
+	if not data_path.exists():
+		return {"error": f"Dataset not found at {data_path}."}
+	df = pd.read_csv(data_path)
+	return {"rows": len(df), "columns": list(df.columns), "preview": _json_records(df.head(n))}
+
+
+# demand query value -> ranking demand column
+DEMAND_COLUMNS = {"history": "avg_daily_sales", "forecast": "forecast_daily_sales"}
+
+
+@lru_cache(maxsize=1)
+def _inventory(path: str, mtime_ns: int):
+	"""
+	Loads the dataset once per version. Keyed on the file's mtime so a new
+	export is picked up without restarting the server.
+	"""
+	from logic.preprocessing import load_inventory
+
+	return load_inventory(path)
+
+
+@lru_cache(maxsize=1)
+def _store_distances(path: str, mtime_ns: int, locations_mtime_ns: int):
+	from logic.geography import load_store_distances
+
+	return load_store_distances(STORE_LOCATIONS_PATH, _inventory(path, mtime_ns))
+
+
+@lru_cache(maxsize=4)
+def _scenario_engine(path: str, mtime_ns: int, locations_mtime_ns: int, demand_column: str):
+	from logic.scenario import ScenarioEngine
+
+	return ScenarioEngine(
+		_inventory(path, mtime_ns),
+		demand_column=demand_column,
+		store_distances=_store_distances(path, mtime_ns, locations_mtime_ns),
+	)
+
+
+@lru_cache(maxsize=4)
+def _snapshot_engine(version: str, demand_column: str):
+	from logic.scenario import ScenarioEngine
+
+	from logic.snapshot import read_manifest
+
+	tables = read_manifest(_snapshot_reader().root, version)["tables"]
+	distances = _snapshot_table("store_distances", version) if "store_distances" in tables else None
+	return ScenarioEngine(
+		_snapshot_table("scores", version),
+		aggregated=True,
+		demand_column=demand_column,
+		store_distances=distances,
+	)
+
+
+def _current_engine(demand_column: str = "avg_daily_sales"):
+	if _snapshot_reader() is not None:
+		return _snapshot_engine(_snapshot_version(), demand_column)
+
+	if not DATA_PATH.exists():
+		raise HTTPException(status_code=404, detail=f"Dataset not found at {DATA_PATH}.")
+	locations_mtime_ns = STORE_LOCATIONS_PATH.stat().st_mtime_ns if STORE_LOCATIONS_PATH.exists() else 0
+	return _scenario_engine(str(DATA_PATH), DATA_PATH.stat().st_mtime_ns, locations_mtime_ns, demand_column)
+
+
+def _current_results():
+	if _snapshot_reader() is not None:
+		version = _snapshot_version()
+		return _snapshot_table("scores", version), _snapshot_table("recommendations", version)
+
+	result = _current_engine().run()
+	return result.scores, result.recommendations
+
+
+def _table_response(df: pd.DataFrame, name: str, fmt: str | None, accept: str | None, limit: int | None, meta: dict | None = None):
+	try:
+		fmt = negotiate_format(fmt, accept)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=str(e))
+
+	if limit is not None:
+		df = df.head(limit)
+
+	if fmt == "json":
+		return {**(meta or {}), "rows": len(df), "columns": list(df.columns), "data": _json_records(df)}
+
+	extension = {"arrow": "arrows", "parquet": "parquet", "ndjson": "ndjson"}[fmt]
+	headers = {"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+	if fmt == "ndjson":
+		# Compressed on the wire only: clients decode it back to plain NDJSON
+		headers["Content-Encoding"] = "gzip"
+
+	return StreamingResponse(encode_table(df, fmt), media_type=FORMATS[fmt], headers=headers)
+
+
+@app.get("/scores")
+def get_scores(
+	format: FormatName | None = Query(None, description="Overrides Accept"),
+	limit: int | None = Query(None, ge=0),
+	accept: str | None = Header(None),
+):
+	scores, _ = _current_results()
+	return _table_response(scores, "scores", format, accept, limit)
+
+
+@app.get("/kpis")
+def get_kpis(approximate: bool = Query(False, description="Merge the loader's per-store sketches instead of scanning every score")):
+	"""Network-wide headline KPIs; approximate figures carry their error bounds."""
+	from logic.sketches import approximate_kpis, exact_kpis
+
+	reader = _snapshot_reader()
+	if approximate and reader is not None and reader.has_table("kpi_sketches"):
+		kpis = approximate_kpis(_snapshot_table("kpi_sketches"))
+	else:
+		approximate = False
+		kpis = exact_kpis(_current_results()[0])
+
+	counts, edges = kpis.pop("stock_histogram")
+	ranking = kpis.pop("store_ranking")
+	return {
+		**{k: (float(v) if not isinstance(v, dict) else {e: float(b) for e, b in v.items()}) for k, v in kpis.items()},
+		"approximate": approximate,
+		"stock_histogram": {"counts": counts.tolist(), "edges": edges.tolist()},
+		"store_ranking": ranking.to_dict(orient="records"),
+	}
+
+
+@app.get("/recommendations")
+def get_recommendations(
+	format: FormatName | None = Query(None, description="Overrides Accept"),
+	limit: int | None = Query(None, ge=0),
+	accept: str | None = Header(None),
+):
+	_, recs = _current_results()
+	return _table_response(recs, "recommendations", format, accept, limit)
+
+
+@app.get("/scenario/recommendations")
+def get_scenario_recommendations(
+	deadstock_threshold: float = Query(0.6, ge=0, le=1),
+	stock_weight: float = Query(0.6, ge=0),
+	sell_through_weight: float = Query(0.4, ge=0),
+	transfer_weights: list[float] = Query([0.5, 0.3, 0.2], min_length=3, max_length=3),
+	exclude_stores: list[str] = Query([]),
+	demand: str = Query("history", pattern="^(history|forecast)$", description="Destination demand: historical mean or forecast velocity"),
+	distance_weight: float = Query(0.2, ge=0, description="Transport-cost penalty (needs store locations)"),
+	format: FormatName | None = Query(None, description="Overrides Accept"),
+	limit: int | None = Query(None, ge=0),
+	accept: str | None = Header(None),
+):
+	"""What-if recommendations, reusing cached aggregates and candidate pairs."""
+	result = _current_engine(DEMAND_COLUMNS[demand]).run(
+		deadstock_threshold=deadstock_threshold,
+		stock_weight=stock_weight,
+		sell_through_weight=sell_through_weight,
+		transfer_weights=transfer_weights,
+		exclude_stores=exclude_stores,
+		distance_weight=distance_weight,
+	)
+	return _table_response(result.recommendations, "scenario_recommendations", format, accept, limit)
+
+
+@lru_cache(maxsize=2)
+def _reconciliation(path: str, mtime_ns: int):
+	from logic.reconciliation import reconcile_inventory_csv
+
+	return reconcile_inventory_csv(path)
+
+
+@lru_cache(maxsize=2)
+def _snapshot_reconciliation(root: str, version: str):
+	"""Reconciles the inventory a snapshot version serves, once per version."""
+	from logic.reconciliation import RECONCILIATION_COLUMNS, reconcile_inventory
+	from logic.snapshot import read_table
+
+	return reconcile_inventory(read_table(root, "inventory", version, columns=RECONCILIATION_COLUMNS))
+
+
+@app.get("/reconciliation")
+def get_reconciliation(
+	by: str = Query("store", pattern="^(store|sku)$"),
+	format: FormatName | None = Query(None, description="Overrides Accept"),
+	limit: int | None = Query(None, ge=0),
+	accept: str | None = Header(None),
+):
+	"""Inventory balance and day-to-day continuity mismatches per store or SKU."""
+	reader = _snapshot_reader()
+	if reader is not None:
+		# The live dataset may come from a watched directory, not DATA_PATH
+		report = _snapshot_reconciliation(str(reader.root), _snapshot_version())
+	elif not DATA_PATH.exists():
+		raise HTTPException(status_code=404, detail=f"Dataset not found at {DATA_PATH}.")
+	else:
+		report = _reconciliation(str(DATA_PATH), DATA_PATH.stat().st_mtime_ns)
+	summary = report.by_store if by == "store" else report.by_sku
+	return _table_response(summary, f"reconciliation_{by}", format, accept, limit, meta={"totals": report.totals})
+
+
+def _history_root():
+	from logic.snapshot import HISTORY_DIR
+
+	root = os.environ.get(SNAPSHOT_ENV)
+	if not root:
+		raise HTTPException(status_code=404, detail=f"Version history needs a snapshot directory ({SNAPSHOT_ENV}).")
+	return os.path.join(root, HISTORY_DIR)
+
+
+@app.get("/history")
+def get_history():
+	"""Every published dataset version, oldest first."""
+	from logic.history import list_versions
+
+	versions = list_versions(_history_root())
+	return {"versions": versions.to_dict(orient="records")}
+
+
+@app.get("/history/diff")
+def get_history_diff(
+	old: str | None = Query(None, description="Baseline version (default: the previous one)"),
+	new: str | None = Query(None, description="Compared version (default: the latest one)"),
+	table: str = Query("recommendations", pattern="^(recommendations|scores)$"),
+	format: FormatName | None = Query(None, description="Overrides Accept"),
+	limit: int | None = Query(None, ge=0),
+	accept: str | None = Header(None),
+):
+	"""Rows added, dropped or re-scored between two published versions."""
+	from logic.history import diff_versions, list_versions, summarise_diff
+
+	root = _history_root()
+	versions = list(list_versions(root)["version"])
+	new = new or (versions[-1] if versions else None)
+	if new not in versions:
+		raise HTTPException(status_code=404, detail=f"Unknown version '{new}'.")
+	if old is None:
+		if versions.index(new) == 0:
+			raise HTTPException(status_code=404, detail="No earlier version to compare with.")
+		old = versions[versions.index(new) - 1]
+	if old not in versions:
+		raise HTTPException(status_code=404, detail=f"Unknown version '{old}'.")
+
+	diff = diff_versions(root, old, new, table=table)
+	meta = {"old": old, "new": new, "summary": summarise_diff(diff)}
+	return _table_response(diff.astype({"change": str}), f"{table}_diff", format, accept, limit, meta=meta)
@@ -0,0 +1,173 @@
+"""
+Response encoders for bulk table endpoints.
+
+Score and recommendation tables can be served as JSON (default), Arrow IPC
+stream, Parquet or gzip-compressed NDJSON. Binary formats are produced batch
+by batch so large pulls never materialise a Python list of row dicts.
+"""
+
+import io
+import zlib
+from typing import Literal
+
+import pandas as pd
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+
+# format name -> media type
+FORMATS = {
+	"json": JSON_MEDIA_TYPE,
+	"arrow": ARROW_MEDIA_TYPE,
+	"parquet": PARQUET_MEDIA_TYPE,
+	"ndjson": NDJSON_MEDIA_TYPE,
+}
+
+# Query parameter type; FastAPI rejects anything else with 422
+FormatName = Literal["json", "arrow", "parquet", "ndjson"]
+
+_ACCEPT_ALIASES = {
+	ARROW_MEDIA_TYPE: "arrow",
+	"application/vnd.apache.arrow.file": "arrow",
+	"application/x-apache-arrow-stream": "arrow",
+	PARQUET_MEDIA_TYPE: "parquet",
+	"application/x-parquet": "parquet",
+	NDJSON_MEDIA_TYPE: "ndjson",
+	"application/jsonlines": "ndjson",
+	JSON_MEDIA_TYPE: "json",
+}
+
+DEFAULT_BATCH_ROWS = 65_536
+
+
+def negotiate_format(fmt: str | None, accept: str | None) -> str:
+	"""
+	Picks the response format from an explicit ``format`` query parameter
+	or, failing that, the request's Accept header.
+
+	Raises:
+		ValueError: If an explicit format is not supported.
+	"""
+	if fmt:
+		fmt = fmt.lower()
+		if fmt not in FORMATS:
+			raise ValueError(
+				f"Unsupported format '{fmt}'. Expected one of: {sorted(FORMATS)}"
+			)
+		return fmt
+
+	if accept:
+		# Honour the client's order of preference, ignoring q-values
+		for part in accept.split(","):
+			media_type = part.split(";")[0].strip().lower()
+			if media_type in _ACCEPT_ALIASES:
+				return _ACCEPT_ALIASES[media_type]
+
+	return "json"
+
+
+def _to_arrow_table(df: pd.DataFrame):
+	import pyarrow as pa
+
+	return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def iter_arrow_ipc(df: pd.DataFrame, batch_rows: int = DEFAULT_BATCH_ROWS):
+	"""
+	Yields an Arrow IPC stream one record batch at a time.
+
+	Record batches are zero-copy slices of the table built from the frame,
+	so only one encoded batch is buffered at any point.
+	"""
+	import pyarrow as pa
+
+	table = _to_arrow_table(df)
+	sink = _ChunkSink()
+
+	with pa.ipc.new_stream(sink, table.schema) as writer:
+		for batch in table.to_batches(max_chunksize=batch_rows):
+			writer.write_batch(batch)
+			yield sink.drain()
+
+	yield sink.drain()
+
+
+def iter_parquet(df: pd.DataFrame, batch_rows: int = DEFAULT_BATCH_ROWS):
+	"""
+	Yields a Parquet file written one row group per batch.
+	"""
+	import pyarrow.parquet as pq
+
+	table = _to_arrow_table(df)
+	sink = _ChunkSink()
+
+	with pq.ParquetWriter(sink, table.schema, compression="zstd") as writer:
+		for batch in table.to_batches(max_chunksize=batch_rows):
+			writer.write_batch(batch)
+			yield sink.drain()
+
+	yield sink.drain()
+
+
+def iter_ndjson_gzip(df: pd.DataFrame, batch_rows: int = DEFAULT_BATCH_ROWS):
+	"""
+	Yields gzip-compressed newline-delimited JSON, one chunk of rows at a time.
+	"""
+	# wbits=31 writes a gzip header and trailer around the deflate stream
+	compressor = zlib.compressobj(wbits=31)
+
+	for start in range(0, len(df), batch_rows):
+		chunk = df.iloc[start:start + batch_rows]
+		# pandas defaults to 10 significant digits; keep full float precision
+		lines = chunk.to_json(orient="records", lines=True, date_format="iso", double_precision=15)
+		if lines and not lines.endswith("\n"):
+			lines += "\n"
+		data = compressor.compress(lines.encode("utf-8"))
+		if data:
+			yield data
+
+	yield compressor.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+	"""
+	Write-only sink that hands out what has been written since the last
+	drain, while still reporting the absolute stream position. Parquet
+	footers record byte offsets, so ``tell()`` must never go backwards.
+	"""
+
+	def __init__(self):
+		self._chunks = []
+		self._position = 0
+
+	def writable(self):
+		return True
+
+	def write(self, data):
+		self._chunks.append(bytes(data))
+		self._position += len(data)
+		return len(data)
+
+	def tell(self):
+		return self._position
+
+	def drain(self) -> bytes:
+		data = b"".join(self._chunks)
+		self._chunks.clear()
+		return data
+
+
+def encode_table(df: pd.DataFrame, fmt: str, batch_rows: int = DEFAULT_BATCH_ROWS):
+	"""
+	Returns a byte iterator for ``df`` encoded in a binary/streaming ``fmt``.
+	"""
+	if fmt == "arrow":
+		return iter_arrow_ipc(df, batch_rows)
+	if fmt == "parquet":
+		return iter_parquet(df, batch_rows)
+	if fmt == "ndjson":
+		return iter_ndjson_gzip(df, batch_rows)
+	raise ValueError(f"Format '{fmt}' is not a streaming format")
+
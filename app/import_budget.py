@@ -0,0 +1,172 @@
+"""
+Import-time budget check for the launcher, the API and the dashboard.
+
+Runs each module's import in a fresh interpreter under
+``python -X importtime``, then fails if the cumulative import time goes
+over budget or if a heavy module that should be loaded lazily shows up.
+The dashboard is a Streamlit script rather than an importable module, so
+its budget covers the first render (via Streamlit's AppTest) and the
+modules loaded by then.
+
+Usage:
+	python -m app.import_budget            # exit code 1 on regressions
+	python -m pytest tests/test_import_budget.py
+"""
+
+import json
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+@dataclass
+class ImportBudget:
+	module: str
+	max_ms: float
+	# Top-level packages that must not be imported eagerly
+	forbidden: list = field(default_factory=list)
+
+
+BUDGETS = [
+	# The launcher only parses arguments and spawns subprocesses
+	ImportBudget(
+		"app.main",
+		max_ms=100,
+		forbidden=["pandas", "numpy", "fastapi", "uvicorn", "streamlit", "plotly", "pyarrow", "logic"],
+	),
+	# The API needs FastAPI and pandas, but the pipeline and Arrow load per request
+	ImportBudget(
+		"app.api",
+		max_ms=2000,
+		forbidden=["streamlit", "plotly", "pyarrow.parquet", "logic"],
+	),
+]
+
+# Streamlit scripts: first render of the default (Overview) tab
+SCRIPT_BUDGETS = [
+	# Lazy tabs: modules only other tabs use must not load on first render
+	ImportBudget(
+		"dashboard/dashboard.py",
+		max_ms=5000,
+		forbidden=["logic.history", "logic.reconciliation", "logic.backends", "duckdb"],
+	),
+]
+
+
+@dataclass
+class ImportReport:
+	module: str
+	cumulative_ms: float
+	imported: set
+
+	def violations(self, budget: ImportBudget) -> list:
+		problems = []
+		if self.cumulative_ms > budget.max_ms:
+			problems.append(
+				f"{self.module}: import took {self.cumulative_ms:.0f} ms "
+				f"(budget {budget.max_ms:.0f} ms)"
+			)
+		for name in budget.forbidden:
+			if name in self.imported:
+				problems.append(f"{self.module}: eagerly imports '{name}'")
+		return problems
+
+
+def measure_import(module: str, python_exec: str = sys.executable, runs: int = 3) -> ImportReport:
+	"""
+	Imports `module` in fresh interpreters and returns the fastest
+	cumulative import time plus every module it pulled in.
+	"""
+	best = None
+	imported = set()
+
+	for _ in range(runs):
+		proc = subprocess.run(
+			[python_exec, "-X", "importtime", "-c", f"import {module}"],
+			capture_output=True,
+			text=True,
+		)
+		if proc.returncode != 0:
+			raise RuntimeError(f"Importing {module} failed:\n{proc.stderr}")
+
+		cumulative = None
+		for line in proc.stderr.splitlines():
+			# "import time:  self [us] | cumulative | imported package"
+			if not line.startswith("import time:") or "imported package" in line:
+				continue
+			_, cumulative_us, name = line[len("import time:"):].split("|")
+			name = name.strip()
+			imported.add(name)
+			if name == module:
+				cumulative = int(cumulative_us) / 1000
+
+		if cumulative is not None and (best is None or cumulative < best):
+			best = cumulative
+
+	return ImportReport(module=module, cumulative_ms=best or 0.0, imported=imported)
+
+
+_RENDER_SCRIPT = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+
+start = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=sys.float_info.max).run()
+elapsed_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({
+	"ms": elapsed_ms,
+	"modules": sorted(sys.modules),
+	"exceptions": [e.value for e in at.exception],
+}))
+"""
+
+
+def measure_script(path: str, python_exec: str = sys.executable) -> ImportReport:
+	"""
+	Renders a Streamlit script once in a fresh interpreter (from the
+	project root, where its relative data paths resolve) and returns the
+	render time plus every module loaded by then.
+	"""
+	proc = subprocess.run(
+		[python_exec, "-c", _RENDER_SCRIPT, path],
+		capture_output=True,
+		text=True,
+		cwd=PROJECT_ROOT,
+	)
+	if proc.returncode != 0:
+		raise RuntimeError(f"Rendering {path} failed:\n{proc.stderr}")
+
+	result = json.loads(proc.stdout.strip().splitlines()[-1])
+	if result["exceptions"]:
+		raise RuntimeError(f"Rendering {path} raised:\n" + "\n".join(result["exceptions"]))
+
+	return ImportReport(module=path, cumulative_ms=result["ms"], imported=set(result["modules"]))
+
+
+def check_budgets(
+	budgets: list = BUDGETS,
+	script_budgets: list = SCRIPT_BUDGETS,
+	python_exec: str = sys.executable,
+) -> list:
+	"""Returns a list of human-readable budget violations (empty when OK)."""
+	problems = []
+	for budget in budgets + script_budgets:
+		measure = measure_script if budget.module.endswith(".py") else measure_import
+		report = measure(budget.module, python_exec)
+		print(f"{budget.module}: {report.cumulative_ms:.0f} ms (budget {budget.max_ms:.0f} ms)")
+		problems.extend(report.violations(budget))
+	return problems
+
+
+def main():
+	problems = check_budgets()
+	for problem in problems:
+		print(f"FAIL {problem}")
+	sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+	main()
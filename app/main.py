@@ -1,57 +1,152 @@
+"""
+Launcher for the dashboard, the API, the shared snapshot loader and
+headless batch runs.
+
+Kept free of heavy imports (pandas, FastAPI, Streamlit): it only parses
+arguments and spawns subprocesses, so it starts instantly. Check with
+python -m app.import_budget.
+"""
+
 import argparse
+import os
 import subprocess
 import sys
+import time
 from pathlib import Path
 
-from fastapi import FastAPI
-import pandas as pd
-
-app = FastAPI()
+if __package__ in (None, ""):
+	# Allow `python app/main.py` from the project root
+	sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
+from app.settings import DATA_PATH, SNAPSHOT_ENV, STORE_LOCATIONS_PATH
 
-@app.get("/")
-def read_root():
-	return {"message": "Deadstock Redistribution API — use /data to preview dataset"}
 
+def __getattr__(name):
+	# Backwards compatible `uvicorn app.main:app`, imported only on demand
+	if name == "app":
+		from app.api import app
 
-@app.get("/data")
-def get_data_preview(n: int = 10):
-	data_path = Path("data/raw/synthetic_retail_sales_inventory.csv")
-	if not data_path.exists():
-		return {"error": f"Dataset not found at {data_path}."}
-	df = pd.read_csv(data_path)
-	return {"rows": len(df), "columns": list(df.columns), "preview": df.head(n).to_dict(orient="records")}
+		return app
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-def run_streamlit(python_exec: str):
+def run_streamlit(python_exec: str, env: dict | None = None):
 	cmd = [python_exec, "-m", "streamlit", "run", "dashboard/dashboard.py"]
+	return subprocess.Popen(cmd, env=env)
+
+
+def run_uvicorn(python_exec: str, workers: int = 1, env: dict | None = None):
+	cmd = [python_exec, "-m", "uvicorn", "app.api:app", "--port", "8000"]
+	# --reload and --workers are mutually exclusive in uvicorn
+	cmd += ["--workers", str(workers)] if workers > 1 else ["--reload"]
+	return subprocess.Popen(cmd, env=env)
+
+
+def build_snapshot(python_exec: str, snapshot_dir: str, backend: str = "pandas", data_path=DATA_PATH):
+	"""Runs the loader in its own process so the launcher never holds the data."""
+	cmd = [python_exec, "-m", "logic.snapshot", str(data_path), snapshot_dir]
+	if STORE_LOCATIONS_PATH.exists():
+		cmd.append(str(STORE_LOCATIONS_PATH))
+	cmd += ["--backend", backend]
+	subprocess.run(cmd, check=True)
+
+
+def run_batch(python_exec: str, output_dir: str, args) -> int:
+	"""Runs logic.batch in its own process; returns its exit code (2: invalid export)."""
+	cmd = [python_exec, "-m", "logic.batch", str(args.data), output_dir, "--backend", args.backend, "--format", args.format]
+	if STORE_LOCATIONS_PATH.exists():
+		cmd += ["--locations", str(STORE_LOCATIONS_PATH)]
+	if args.threads:
+		cmd += ["--threads", str(args.threads)]
+	if args.memory_limit:
+		cmd += ["--memory-limit", args.memory_limit]
+	if args.cache:
+		cmd.append("--cache")
+	if args.resume:
+		cmd.append("--resume")
+	return subprocess.run(cmd).returncode
+
+
+def run_watcher(python_exec: str, data_dir: str, snapshot_dir: str):
+	"""Long-running loader that republishes the snapshot as exports arrive."""
+	cmd = [python_exec, "-m", "logic.watcher", data_dir, snapshot_dir]
+	if STORE_LOCATIONS_PATH.exists():
+		cmd += ["--locations", str(STORE_LOCATIONS_PATH)]
 	return subprocess.Popen(cmd)
 
 
-def run_uvicorn(python_exec: str):
-	cmd = [python_exec, "-m", "uvicorn", "app.main:app", "--reload", "--port", "8000"]
-	return subprocess.Popen(cmd)
+def wait_for_snapshot(snapshot_dir: str, proc, timeout: float = 600):
+	"""Blocks until the first version is live (logic.snapshot's CURRENT pointer)."""
+	deadline = time.monotonic() + timeout
+	while not (Path(snapshot_dir) / "CURRENT").exists():
+		if proc.poll() is not None or time.monotonic() > deadline:
+			raise SystemExit("Watcher did not publish a snapshot")
+		time.sleep(0.2)
 
 
 def main():
 	parser = argparse.ArgumentParser()
-	parser.add_argument("--mode", choices=["streamlit", "api"], default="streamlit")
+	parser.add_argument("--mode", choices=["streamlit", "api", "all", "batch"], default="streamlit")
 	parser.add_argument("--python", default=sys.executable)
+	parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+	parser.add_argument(
+		"--snapshot-dir",
+		default=os.environ.get(SNAPSHOT_ENV),
+		help="Write the processed dataset here once and memory-map it from every process",
+	)
+	parser.add_argument(
+		"--watch-dir",
+		help="Watch this directory of ERP exports and republish the snapshot incrementally (needs --snapshot-dir)",
+	)
+	parser.add_argument(
+		"--backend",
+		choices=["pandas", "duckdb"],
+		default="pandas",
+		help="Execution backend for scoring and ranking when building the snapshot or in batch mode",
+	)
+	parser.add_argument("--data", default=str(DATA_PATH), help="ERP export for the snapshot or batch run")
+
+	batch = parser.add_argument_group("batch mode", "Run the pipeline once and write outputs plus a run report")
+	batch.add_argument("--output-dir", default="output")
+	batch.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+	batch.add_argument("--threads", type=int, help="Worker threads for DuckDB and Arrow (default: all cores)")
+	batch.add_argument("--memory-limit", help="e.g. 8GB")
+	batch.add_argument("--cache", action="store_true", help="Cache stage outputs for a later --resume")
+	batch.add_argument("--resume", action="store_true", help="Reuse cached stages whose inputs are unchanged (implies --cache)")
 	args = parser.parse_args()
 
-	if args.mode == "streamlit":
+	if args.mode == "batch":
+		sys.exit(run_batch(args.python, args.output_dir, args))
+
+	if args.watch_dir and not args.snapshot_dir:
+		parser.error("--watch-dir requires --snapshot-dir")
+
+	env = None
+	procs = []
+	if args.watch_dir:
+		print(f"Watching {args.watch_dir}, publishing snapshots to {args.snapshot_dir} ...")
+		procs.append(run_watcher(args.python, args.watch_dir, args.snapshot_dir))
+		wait_for_snapshot(args.snapshot_dir, procs[-1])
+		env = {**os.environ, SNAPSHOT_ENV: args.snapshot_dir}
+	elif args.snapshot_dir:
+		print(f"Building shared snapshot in {args.snapshot_dir} ...")
+		build_snapshot(args.python, args.snapshot_dir, args.backend, args.data)
+		env = {**os.environ, SNAPSHOT_ENV: args.snapshot_dir}
+
+	if args.mode in ("streamlit", "all"):
 		print("Starting Streamlit dashboard...")
-		proc = run_streamlit(args.python)
-	else:
+		procs.append(run_streamlit(args.python, env))
+	if args.mode in ("api", "all"):
 		print("Starting FastAPI (uvicorn) server on http://localhost:8000 ...")
-		proc = run_uvicorn(args.python)
+		procs.append(run_uvicorn(args.python, args.workers, env))
 
 	try:
-		proc.wait()
+		for proc in procs:
+			proc.wait()
 	except KeyboardInterrupt:
-		proc.terminate()
+		for proc in procs:
+			proc.terminate()
 
 
 if __name__ == "__main__":
 	main()
-
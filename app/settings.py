@@ -0,0 +1,11 @@
+from pathlib import Path
+
+DATA_PATH = Path("data/raw/synthetic_retail_sales_inventory.csv")
+
+# Optional Store, Latitude, Longitude[, Region] file enabling
+# geography-aware matching (see logic.geography).
+STORE_LOCATIONS_PATH = Path("data/raw/store_locations.csv")
+
+# When set, every worker memory-maps the loader's snapshot instead of
+# loading its own copy of the dataset (see logic.snapshot).
+SNAPSHOT_ENV = "DEADSTOCK_SNAPSHOT_DIR"
@@ -0,0 +1,737 @@
+"""
+Execution backends for the scoring and ranking pipeline.
+
+The same pipeline — SKU–Store aggregation, deadstock normalisation and
+the source/destination join — can run on:
+
+    pandas   compute_deadstock_score() + get_redistribution_recommendations()
+    duckdb   SQL in an embedded DuckDB connection: multi-threaded, spills to
+             disk when the data does not fit in memory, and reads CSV /
+             Parquet exports directly instead of loading them into pandas
+
+Both take either a cleaned DataFrame or a path to an ERP export and return
+(scores, recommendations) frames with the same columns. The DuckDB output
+is checked against pandas by logic.equivalence (python -m logic.equivalence
+duckdb).
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+from logic.scoring import DEFAULT_STOCK_WEIGHT, DEFAULT_SELL_THROUGH_WEIGHT
+from logic.ranking import (
+    DEFAULT_DEADSTOCK_THRESHOLD,
+    DEFAULT_TRANSFER_WEIGHTS,
+    DEFAULT_DISTANCE_WEIGHT,
+    RECOMMENDATION_COLUMNS
+)
+
+
+BACKENDS = ('pandas', 'duckdb')
+
+SCORE_COLUMNS = [
+    'SKU',
+    'Store',
+    'total_sales',
+    'avg_daily_sales',
+    'current_stock',
+    'sell_through_rate',
+    'deadstock_score'
+]
+
+REQUIRED_COLUMNS = [
+    'Date',
+    'Store',
+    'SKU',
+    'Opening_Stock',
+    'Replenishment',
+    'Sales',
+    'Closing_Stock'
+]
+
+NUMERIC_COLUMNS = ['Opening_Stock', 'Replenishment', 'Sales', 'Closing_Stock']
+
+# Destination demand measures ranking can use (see logic.forecasting)
+DEMAND_COLUMNS = ('avg_daily_sales', 'forecast_daily_sales')
+
+
+def run_pipeline(
+    source,
+    backend: str = 'pandas',
+    stock_weight: float = DEFAULT_STOCK_WEIGHT,
+    sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT,
+    deadstock_threshold: float = DEFAULT_DEADSTOCK_THRESHOLD,
+    transfer_weights: tuple = DEFAULT_TRANSFER_WEIGHTS,
+    exclude_stores=None,
+    store_distances: pd.DataFrame = None,
+    distance_weight: float = DEFAULT_DISTANCE_WEIGHT,
+    demand_column: str = 'avg_daily_sales',
+    **backend_options
+) -> tuple:
+    """
+    Scores an ERP dataset and ranks redistribution candidates.
+
+    Parameters:
+        source (str | Path | pd.DataFrame): CSV/Parquet export, or cleaned
+            daily ERP data (output of clean_inventory_df())
+        backend (str): One of BACKENDS
+        store_distances (pd.DataFrame, optional): Output of
+            logic.geography.build_distance_matrix()
+        demand_column (str): One of DEMAND_COLUMNS; with
+            'forecast_daily_sales' the scores gain that column and
+            destinations are ranked by forecast velocity
+        **backend_options: Passed to the backend, e.g. threads or
+            memory_limit for duckdb
+
+    Returns:
+        tuple: (scores, recommendations) DataFrames
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of: {BACKENDS}")
+
+    pipeline = pandas_pipeline if backend == 'pandas' else duckdb_pipeline
+    return pipeline(
+        source,
+        stock_weight=stock_weight,
+        sell_through_weight=sell_through_weight,
+        deadstock_threshold=deadstock_threshold,
+        transfer_weights=transfer_weights,
+        exclude_stores=exclude_stores,
+        store_distances=store_distances,
+        distance_weight=distance_weight,
+        demand_column=demand_column,
+        **backend_options
+    )
+
+
+def _check_demand_column(demand_column: str) -> None:
+    # Also guards the column name interpolated into the ranking SQL
+    if demand_column not in DEMAND_COLUMNS:
+        raise ValueError(f"Unknown demand column '{demand_column}'. Expected one of: {DEMAND_COLUMNS}")
+
+
+def score_inventory(
+    source,
+    backend: str = 'pandas',
+    stock_weight: float = DEFAULT_STOCK_WEIGHT,
+    sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT,
+    **backend_options
+) -> pd.DataFrame:
+    """
+    The scoring half of run_pipeline(), for callers that cache scores
+    separately from recommendations (see logic.batch).
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of: {BACKENDS}")
+
+    if backend == 'pandas':
+        from logic.preprocessing import load_inventory
+        from logic.scoring import compute_deadstock_score
+
+        df = load_inventory(str(source)) if isinstance(source, (str, Path)) else source
+        return compute_deadstock_score(df, stock_weight=stock_weight, sell_through_weight=sell_through_weight)
+
+    con = connect(**backend_options)
+    try:
+        _load_erp(con, source)
+        _score(con, stock_weight, sell_through_weight)
+        return con.execute("SELECT * FROM scores").df()[SCORE_COLUMNS]
+    finally:
+        con.close()
+
+
+def rank_scores(
+    scores: pd.DataFrame,
+    backend: str = 'pandas',
+    deadstock_threshold: float = DEFAULT_DEADSTOCK_THRESHOLD,
+    transfer_weights: tuple = DEFAULT_TRANSFER_WEIGHTS,
+    exclude_stores=None,
+    store_distances: pd.DataFrame = None,
+    distance_weight: float = DEFAULT_DISTANCE_WEIGHT,
+    demand_column: str = 'avg_daily_sales',
+    **backend_options
+) -> pd.DataFrame:
+    """
+    The ranking half of run_pipeline(), starting from existing scores.
+    Scores must already hold demand_column (see add_demand_forecast()).
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of: {BACKENDS}")
+    _check_demand_column(demand_column)
+
+    if backend == 'pandas':
+        from logic.ranking import get_redistribution_recommendations
+
+        return get_redistribution_recommendations(
+            scores,
+            deadstock_threshold=deadstock_threshold,
+            transfer_weights=transfer_weights,
+            exclude_stores=exclude_stores,
+            demand_column=demand_column,
+            store_distances=store_distances,
+            distance_weight=distance_weight
+        )
+
+    columns = list(dict.fromkeys(SCORE_COLUMNS + [demand_column]))
+    if not set(columns).issubset(scores.columns):
+        raise ValueError(f"Input DataFrame must contain columns: {set(columns)}")
+
+    con = connect(**backend_options)
+    try:
+        con.register('scores_input', scores[columns])
+        con.execute("CREATE OR REPLACE TEMP TABLE scores AS SELECT * FROM scores_input")
+        con.unregister('scores_input')
+        return _rank(
+            con,
+            deadstock_threshold,
+            transfer_weights,
+            exclude_stores,
+            store_distances,
+            distance_weight,
+            demand_column
+        )
+    finally:
+        con.close()
+
+
+# ---------------------------------------------------------
+# pandas
+# ---------------------------------------------------------
+def pandas_pipeline(
+    source,
+    stock_weight: float = DEFAULT_STOCK_WEIGHT,
+    sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT,
+    deadstock_threshold: float = DEFAULT_DEADSTOCK_THRESHOLD,
+    transfer_weights: tuple = DEFAULT_TRANSFER_WEIGHTS,
+    exclude_stores=None,
+    store_distances: pd.DataFrame = None,
+    distance_weight: float = DEFAULT_DISTANCE_WEIGHT,
+    demand_column: str = 'avg_daily_sales'
+) -> tuple:
+    """The reference implementation every other backend must agree with."""
+    from logic.preprocessing import load_inventory
+    from logic.scoring import compute_deadstock_score
+    from logic.ranking import get_redistribution_recommendations
+
+    _check_demand_column(demand_column)
+    df = load_inventory(str(source)) if isinstance(source, (str, Path)) else source
+
+    scores = compute_deadstock_score(
+        df,
+        stock_weight=stock_weight,
+        sell_through_weight=sell_through_weight
+    )
+    if demand_column == 'forecast_daily_sales':
+        from logic.forecasting import add_demand_forecast
+        scores = add_demand_forecast(scores, df)
+
+    recs = get_redistribution_recommendations(
+        scores,
+        deadstock_threshold=deadstock_threshold,
+        transfer_weights=transfer_weights,
+        exclude_stores=exclude_stores,
+        demand_column=demand_column,
+        store_distances=store_distances,
+        distance_weight=distance_weight
+    )
+    return scores, recs
+
+
+# ---------------------------------------------------------
+# DuckDB
+# ---------------------------------------------------------
+def _duckdb():
+    import duckdb
+
+    return duckdb
+
+
+def connect(threads: int = None, memory_limit: str = None, temp_directory: str = None):
+    """
+    Opens an in-memory DuckDB connection.
+
+    Parameters:
+        threads (int, optional): Worker threads (default: all cores)
+        memory_limit (str, optional): e.g. '4GB'; larger intermediates
+            spill to temp_directory instead of failing
+        temp_directory (str, optional): Where spilled data is written
+    """
+    config = {'preserve_insertion_order': True}
+    if threads:
+        config['threads'] = threads
+    if memory_limit:
+        config['memory_limit'] = memory_limit
+    if temp_directory:
+        config['temp_directory'] = str(temp_directory)
+    return _duckdb().connect(config=config)
+
+
+def _scan(path) -> str:
+    reader = 'read_parquet' if Path(path).suffix.lower() in ('.parquet', '.pq') else 'read_csv'
+    return f"{reader}('{str(path).replace(chr(39), chr(39) * 2)}')"
+
+
+def _to_int(col: str) -> str:
+    # pd.to_numeric(errors='coerce').fillna(0).astype(int): truncate, 0 if invalid
+    return f'COALESCE(TRY_CAST(trunc(TRY_CAST("{col}" AS DOUBLE)) AS BIGINT), 0)'
+
+
+def _validate_export(con, scan: str) -> None:
+    """
+    SQL version of validate_inventory_df(), run over the loaded export.
+
+    Raises:
+        ValueError: If critical validation checks fail.
+    """
+
+    columns = [row[0] for row in con.execute(f"DESCRIBE SELECT * FROM {scan}").fetchall()]
+
+    missing_cols = set(REQUIRED_COLUMNS) - set(columns)
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+
+    null_counts = pd.Series(
+        con.execute(
+            "SELECT " + ", ".join(f'count(*) - count("{c}")' for c in columns) + f" FROM {scan}"
+        ).fetchone(),
+        index=columns
+    )
+    if null_counts.sum() > 0:
+        raise ValueError(f"Missing values detected:\n{null_counts[null_counts > 0]}")
+
+    duplicates, negatives, bad_dates = con.execute(f"""
+        SELECT
+            (SELECT coalesce(sum(n), 0) FROM (
+                SELECT count(*) AS n FROM {scan}
+                GROUP BY "Date", "Store", "SKU" HAVING count(*) > 1
+            )),
+            (SELECT count(*) FROM {scan}
+                WHERE {' OR '.join(f'TRY_CAST("{c}" AS DOUBLE) < 0' for c in NUMERIC_COLUMNS)}),
+            (SELECT count(*) FROM {scan}
+                WHERE try_strptime(CAST("Date" AS VARCHAR), '%Y-%m-%d') IS NULL)
+    """).fetchone()
+
+    if duplicates:
+        raise ValueError(
+            f"Duplicate records detected for Date + Store + SKU. "
+            f"Count: {duplicates}"
+        )
+    if negatives:
+        raise ValueError("Negative values detected in stock or sales columns.")
+    if bad_dates:
+        raise ValueError(
+            "Invalid date format detected in 'Date' column. Expected YYYY-MM-DD."
+        )
+
+
+def _load_erp(con, source) -> None:
+    """
+    Loads the source into the `erp_export` temp table and exposes the
+    cleaned columns scoring needs as the `erp` view.
+
+    Insertion order is preserved, so rowid follows the source row order
+    and 'last closing stock' means the same thing as in pandas. Text keys
+    are standardised through small lookup tables built with the exact
+    Python string methods clean_inventory_df() uses, so only the distinct
+    values ever leave DuckDB.
+    """
+
+    _read_export(con, source)
+    if isinstance(source, (str, Path)):
+        # Parse the file once; validation and cleaning then scan the table
+        _validate_export(con, 'erp_export')
+    _clean_export(con)
+
+
+def _read_export(con, source) -> None:
+    """Loads a file or cleaned frame into the `erp_export` temp table."""
+
+    if isinstance(source, (str, Path)):
+        con.execute(f"CREATE OR REPLACE TEMP TABLE erp_export AS SELECT * FROM {_scan(source)}")
+    else:
+        missing_cols = {'SKU', 'Store', 'Sales', 'Closing_Stock'} - set(source.columns)
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {missing_cols}")
+        # Date is only needed for forecasting, which cleaned frames carry
+        columns = ['SKU', 'Store', 'Sales', 'Closing_Stock'] + (['Date'] if 'Date' in source.columns else [])
+        con.register('erp_input', source[columns])
+        con.execute("CREATE OR REPLACE TEMP TABLE erp_export AS SELECT * FROM erp_input")
+        con.unregister('erp_input')
+
+
+def _clean_export(con) -> None:
+    """SQL version of clean_inventory_df() for the columns scoring needs."""
+
+    for column, standardise in (
+        ('SKU', lambda s: s.str.strip().str.upper()),
+        ('Store', lambda s: s.str.strip().str.title())
+    ):
+        values = con.execute(f'SELECT DISTINCT CAST("{column}" AS VARCHAR) AS raw FROM erp_export').df()
+        values[column] = standardise(values['raw'].astype(str))
+        con.register(f'{column.lower()}_names', values)
+
+    columns = [row[0] for row in con.execute("DESCRIBE erp_export").fetchall()]
+    date = ', CAST(e."Date" AS DATE) AS "Date"' if 'Date' in columns else ''
+
+    con.execute(f"""
+        CREATE OR REPLACE TEMP VIEW erp AS
+        SELECT
+            e.rowid AS row_id,
+            k.SKU,
+            s.Store,
+            {_to_int('Sales')} AS Sales,
+            {_to_int('Closing_Stock')} AS Closing_Stock
+            {date}
+        FROM erp_export e
+        JOIN sku_names k ON k.raw = CAST(e."SKU" AS VARCHAR)
+        JOIN store_names s ON s.raw = CAST(e."Store" AS VARCHAR)
+    """)
+
+
+def _reconcile_export(con) -> dict:
+    """
+    SQL version of the mismatch counts logic.batch reports:
+    validate_inventory_df()'s inventory_mismatch flag plus the
+    reconcile_inventory() totals, over the loaded export.
+    """
+
+    raw = {c: f'TRY_CAST(e."{c}" AS DOUBLE)' for c in NUMERIC_COLUMNS}
+    row = con.execute(f"""
+        WITH rows AS (
+            SELECT
+                k.SKU,
+                s.Store,
+                e.rowid AS row_id,
+                CAST(e."Date" AS DATE) AS "Date",
+                {raw['Opening_Stock']} + {raw['Replenishment']} - {raw['Sales']}
+                    <> {raw['Closing_Stock']} AS inventory_mismatch,
+                {_to_int('Closing_Stock')} -
+                    ({_to_int('Opening_Stock')} + {_to_int('Replenishment')} - {_to_int('Sales')}) AS balance_delta,
+                {_to_int('Opening_Stock')} AS Opening_Stock,
+                {_to_int('Closing_Stock')} AS Closing_Stock
+            FROM erp_export e
+            JOIN sku_names k ON k.raw = CAST(e."SKU" AS VARCHAR)
+            JOIN store_names s ON s.raw = CAST(e."Store" AS VARCHAR)
+        ),
+        deltas AS (
+            SELECT
+                *,
+                Opening_Stock - lag(Closing_Stock) OVER w AS continuity_delta,
+                greatest(date_diff('day', lag("Date") OVER w, "Date") - 1, 0) AS missing_days
+            FROM rows
+            WINDOW w AS (PARTITION BY SKU, Store ORDER BY "Date", row_id)
+        )
+        SELECT
+            count_if(inventory_mismatch),
+            count_if(balance_delta <> 0),
+            coalesce(sum(abs(balance_delta)), 0),
+            count_if(continuity_delta <> 0),
+            coalesce(sum(abs(continuity_delta)), 0),
+            coalesce(sum(missing_days), 0)
+        FROM deltas
+    """).fetchone()
+
+    names = [
+        'inventory_mismatch',
+        'balance_mismatches',
+        'balance_abs_delta',
+        'continuity_breaks',
+        'continuity_abs_delta',
+        'missing_days'
+    ]
+    return {name: int(value) for name, value in zip(names, row)}
+
+
+def _export_regions(con) -> dict | None:
+    """SQL version of store_regions(): first Region seen per Store."""
+
+    columns = [row[0] for row in con.execute("DESCRIBE erp_export").fetchall()]
+    if 'Region' not in columns:
+        return None
+
+    regions = con.execute("""
+        SELECT s.Store, arg_min(CAST(e."Region" AS VARCHAR), e.rowid) AS Region
+        FROM erp_export e
+        JOIN store_names s ON s.raw = CAST(e."Store" AS VARCHAR)
+        GROUP BY s.Store
+    """).df()
+    return dict(zip(regions['Store'], regions['Region'].astype(str).str.strip().str.title()))
+
+
+class SQLBatch:
+    """
+    One DuckDB connection carrying an export through the load → validate →
+    clean → score stages of logic.batch, so the export is never loaded
+    into pandas and the memory limit and spilling apply to every stage.
+
+    Parameters:
+        threads, memory_limit, temp_directory: See connect()
+    """
+
+    def __init__(self, threads: int = None, memory_limit: str = None, temp_directory: str = None):
+        self.con = connect(threads, memory_limit, temp_directory)
+
+    def load(self, path) -> int:
+        """Reads a CSV/Parquet export; returns its row count."""
+        _read_export(self.con, path)
+        return self.con.execute("SELECT count(*) FROM erp_export").fetchone()[0]
+
+    def validate(self) -> None:
+        """Raises ValueError like validate_inventory_df()."""
+        _validate_export(self.con, 'erp_export')
+
+    def clean(self) -> None:
+        _clean_export(self.con)
+
+    def stats(self) -> dict:
+        """Mismatch counts and store regions of the loaded (raw) export."""
+        return {'mismatches': _reconcile_export(self.con), 'regions': _export_regions(self.con)}
+
+    def save_clean(self, path) -> None:
+        """Writes the cleaned columns scoring needs as Parquet, in row order."""
+        columns = [row[0] for row in self.con.execute("DESCRIBE erp").fetchall() if row[0] != 'row_id']
+        select = ', '.join(f'"{c}"' for c in columns)
+        target = str(path).replace("'", "''")
+        self.con.execute(f"COPY (SELECT {select} FROM erp ORDER BY row_id) TO '{target}' (FORMAT parquet)")
+
+    def score(
+        self,
+        stock_weight: float = DEFAULT_STOCK_WEIGHT,
+        sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT
+    ) -> pd.DataFrame:
+        _score(self.con, stock_weight, sell_through_weight)
+        return self.con.execute("SELECT * FROM scores").df()[SCORE_COLUMNS]
+
+    def close(self) -> None:
+        self.con.close()
+
+
+def _score(con, stock_weight: float, sell_through_weight: float) -> None:
+    """SQL version of compute_deadstock_score() into the `scores` temp table."""
+
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE scores AS
+        WITH agg AS (
+            SELECT
+                SKU,
+                Store,
+                CAST(sum(Sales) AS BIGINT) AS total_sales,
+                avg(Sales) AS avg_daily_sales,
+                arg_max(Closing_Stock, row_id) AS current_stock
+            FROM erp
+            GROUP BY SKU, Store
+        ),
+        rated AS (
+            SELECT
+                *,
+                CASE WHEN current_stock > 0
+                    THEN total_sales / current_stock ELSE 0 END AS sell_through_rate
+            FROM agg
+        ),
+        raw AS (
+            SELECT
+                *,
+                -- NULL when every store is out of stock, as 0/0 is NaN in pandas
+                current_stock / nullif(max(current_stock) OVER (), 0) * $stock_weight +
+                (1 - least(greatest(sell_through_rate, 0), 1)) * $sell_through_weight AS raw_score
+            FROM rated
+        ),
+        bounds AS (
+            SELECT *, min(raw_score) OVER () AS lo, max(raw_score) OVER () AS hi
+            FROM raw
+        )
+        SELECT
+            SKU,
+            Store,
+            total_sales,
+            avg_daily_sales,
+            current_stock,
+            sell_through_rate,
+            CASE WHEN hi > lo THEN (raw_score - lo) / (hi - lo) ELSE 0 END AS deadstock_score
+        FROM bounds
+        ORDER BY SKU, Store
+    """, {'stock_weight': stock_weight, 'sell_through_weight': sell_through_weight})
+
+
+def _add_forecast(con) -> None:
+    """
+    Adds forecast_daily_sales to the `scores` temp table. The Holt-Winters
+    recursion itself runs in NumPy (logic.forecasting); only the daily
+    Date/SKU/Store/Sales columns leave DuckDB.
+    """
+    from logic.forecasting import forecast_demand
+
+    columns = [row[0] for row in con.execute("DESCRIBE erp").fetchall()]
+    if 'Date' not in columns:
+        raise ValueError("Forecast-based ranking needs the daily Date column")
+
+    daily = con.execute('SELECT "Date", SKU, Store, Sales FROM erp ORDER BY row_id').df()
+    con.register('forecast', forecast_demand(daily)[['SKU', 'Store', 'forecast_daily_sales']])
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE scores AS
+        SELECT s.*, coalesce(f.forecast_daily_sales, 0) AS forecast_daily_sales
+        FROM scores s
+        LEFT JOIN forecast f USING (SKU, Store)
+        ORDER BY SKU, Store
+    """)
+    con.unregister('forecast')
+
+
+def _rank(
+    con,
+    deadstock_threshold: float,
+    transfer_weights: tuple,
+    exclude_stores,
+    store_distances: pd.DataFrame,
+    distance_weight: float,
+    demand_column: str = 'avg_daily_sales'
+) -> pd.DataFrame:
+    """SQL version of get_redistribution_recommendations()."""
+
+    _check_demand_column(demand_column)
+
+    deadstock_weight, stock_weight, demand_weight = transfer_weights
+    params = {
+        'threshold': deadstock_threshold,
+        'exclude': [str(s) for s in exclude_stores or []],
+        'deadstock_weight': deadstock_weight,
+        'stock_weight': stock_weight,
+        'demand_weight': demand_weight
+    }
+
+    columns = f"""
+        s.SKU,
+        s.Store AS store_from,
+        t.Store AS store_to,
+        s.deadstock_score AS deadstock_score_source,
+        s.current_stock AS current_stock_source,
+        t.{demand_column} AS demand_dest
+    """
+
+    if store_distances is not None:
+        con.register('store_distances', store_distances[['store_from', 'store_to', 'distance_km']])
+        # Only the precomputed nearest stores are candidate destinations;
+        # stores without coordinates fall back to plain SKU matching
+        matched = f"""
+            SELECT {columns}, d.distance_km
+            FROM source s
+            JOIN store_distances d ON d.store_from = s.Store
+            JOIN dest t ON t.SKU = s.SKU AND t.Store = d.store_to
+            WHERE s.Store <> t.Store
+            UNION ALL
+            SELECT {columns}, NULL AS distance_km
+            FROM source s
+            JOIN dest t ON t.SKU = s.SKU
+            WHERE s.Store <> t.Store
+              AND (s.Store NOT IN (SELECT Store FROM located)
+                   OR t.Store NOT IN (SELECT Store FROM located))
+        """
+        # Stores with coordinates all have (at least) a self row
+        located = """
+            located AS (SELECT DISTINCT store_from AS Store FROM store_distances),
+        """
+        params['distance_weight'] = distance_weight
+        # Clamped so the penalty cannot push a transfer below 0
+        score = """
+            greatest({score}
+                - $distance_weight * CASE
+                    WHEN distance_km IS NULL THEN 1
+                    WHEN max(distance_km) OVER () > 0 THEN distance_km / max(distance_km) OVER ()
+                    ELSE 0 END,
+            0)
+        """
+        output = RECOMMENDATION_COLUMNS + ['distance_km']
+    else:
+        matched = f"""
+            SELECT {columns}, NULL AS distance_km
+            FROM source s JOIN dest t ON t.SKU = s.SKU
+            WHERE s.Store <> t.Store
+        """
+        located = ""
+        score = "{score}"
+        output = RECOMMENDATION_COLUMNS
+
+    score = score.format(score="""
+        $deadstock_weight * deadstock_score_source +
+        $stock_weight * CASE WHEN max(current_stock_source) OVER () > 0
+            THEN current_stock_source / max(current_stock_source) OVER () ELSE 0 END +
+        $demand_weight * CASE WHEN max(demand_dest) OVER () > 0
+            THEN demand_dest / max(demand_dest) OVER () ELSE 0 END
+    """)
+
+    recs = con.execute(f"""
+        WITH eligible AS (
+            SELECT * FROM scores WHERE NOT list_contains($exclude, Store)
+        ),
+        source AS (
+            SELECT * FROM eligible
+            WHERE deadstock_score >= $threshold AND current_stock > 0
+        ),
+        dest AS (
+            SELECT * FROM eligible WHERE {demand_column} > 0
+        ),
+        {located}
+        matched AS ({matched})
+        SELECT
+            SKU,
+            store_from,
+            store_to,
+            {score} AS transfer_score,
+            distance_km
+        FROM matched
+        ORDER BY transfer_score DESC
+    """, params).df()
+
+    if recs.empty:
+        return pd.DataFrame(columns=RECOMMENDATION_COLUMNS)
+    return recs[output]
+
+
+def duckdb_pipeline(
+    source,
+    stock_weight: float = DEFAULT_STOCK_WEIGHT,
+    sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT,
+    deadstock_threshold: float = DEFAULT_DEADSTOCK_THRESHOLD,
+    transfer_weights: tuple = DEFAULT_TRANSFER_WEIGHTS,
+    exclude_stores=None,
+    store_distances: pd.DataFrame = None,
+    distance_weight: float = DEFAULT_DISTANCE_WEIGHT,
+    demand_column: str = 'avg_daily_sales',
+    threads: int = None,
+    memory_limit: str = None,
+    temp_directory: str = None
+) -> tuple:
+    """
+    Runs the pipeline as SQL in a private DuckDB connection.
+
+    File sources are validated and cleaned in SQL (see
+    validate_inventory_df() / clean_inventory_df()) without ever being
+    loaded into pandas; only scores and recommendations are returned as
+    DataFrames.
+    """
+
+    _check_demand_column(demand_column)
+    con = connect(threads, memory_limit, temp_directory)
+    try:
+        _load_erp(con, source)
+        _score(con, stock_weight, sell_through_weight)
+        if demand_column == 'forecast_daily_sales':
+            _add_forecast(con)
+        scores = con.execute("SELECT * FROM scores").df()
+        recs = _rank(
+            con,
+            deadstock_threshold,
+            transfer_weights,
+            exclude_stores,
+            store_distances,
+            distance_weight,
+            demand_column
+        )
+    finally:
+        con.close()
+
+    return scores[list(dict.fromkeys(SCORE_COLUMNS + [demand_column]))], recs
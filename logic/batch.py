@@ -0,0 +1,520 @@
+"""
+Headless batch run for schedulers.
+
+Runs load → validate → clean → score → rank once over an ERP export and
+writes scores and recommendations as Parquet or CSV next to a JSON run
+report (per-stage timings and row counts, inventory mismatch counts).
+
+With --backend duckdb the export is read, validated, cleaned and scored
+in SQL without ever being loaded into pandas, so --memory-limit and
+spilling to disk apply to every stage.
+
+With --cache (or --resume), the outputs of the clean, score and rank
+stages are cached under <output_dir>/.cache with a key derived from the
+input file and every parameter the stage depends on. With --resume, the
+run starts after the last stage whose cached output is still valid. A
+rerun after a failed night, or with only ranking parameters changed,
+therefore redoes only the stale stages.
+
+Exit codes: 0 on success, 2 when the export fails validation, 1 on any
+other error. The report is written in every case.
+
+Layout:
+    <output_dir>/scores.<format>
+    <output_dir>/recommendations.<format>
+    <output_dir>/report.json
+    <output_dir>/.cache/<stage>.parquet      (--cache / --resume only)
+    <output_dir>/.cache/stages.json          -> key and stats of each cached stage
+
+Usage:
+    python -m logic.batch <data.csv> <output_dir> [--locations store_locations.csv]
+        [--backend duckdb] [--threads 4] [--memory-limit 8GB] [--format csv]
+        [--cache] [--resume] [--stock-weight 0.6] [--sell-through-weight 0.4]
+        [--transfer-weights 0.5 0.3 0.2] [--distance-weight 0.2]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from logic.preprocessing import read_export
+from logic.data_validation import validate_inventory_df
+from logic.data_cleaning import clean_inventory_df
+from logic.reconciliation import SUMMARY_COLUMNS, reconcile_inventory
+from logic.geography import build_distance_matrix, load_store_locations, store_regions
+from logic.backends import BACKENDS, SQLBatch, score_inventory, rank_scores
+from logic.scoring import DEFAULT_STOCK_WEIGHT, DEFAULT_SELL_THROUGH_WEIGHT
+from logic.ranking import (
+    DEFAULT_DEADSTOCK_THRESHOLD,
+    DEFAULT_TRANSFER_WEIGHTS,
+    DEFAULT_DISTANCE_WEIGHT
+)
+
+
+STAGES = ['load', 'validate', 'clean', 'score', 'rank']
+
+FORMATS = ('parquet', 'csv')
+
+CACHE_DIR = ".cache"
+CACHE_INDEX = "stages.json"
+REPORT_FILE = "report.json"
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INVALID = 2
+
+MEMORY_UNITS = {
+    '': 1, 'B': 1,
+    'KB': 10 ** 3, 'MB': 10 ** 6, 'GB': 10 ** 9, 'TB': 10 ** 12,
+    'KIB': 2 ** 10, 'MIB': 2 ** 20, 'GIB': 2 ** 30, 'TIB': 2 ** 40
+}
+
+
+def parse_memory_limit(limit: str) -> int:
+    """'512MB', '8GB', '4GiB', ... -> bytes, using DuckDB's unit conventions."""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([A-Za-z]*)\s*', str(limit))
+    if not match or match.group(2).upper() not in MEMORY_UNITS:
+        raise ValueError(f"Invalid memory limit '{limit}'. Expected e.g. '512MB' or '8GB'")
+    return int(float(match.group(1)) * MEMORY_UNITS[match.group(2).upper()])
+
+
+def _file_key(path) -> dict | None:
+    if path is None:
+        return None
+    path = Path(path)
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return {"path": str(path.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _write_atomic(df: pd.DataFrame, path: Path, output_format: str) -> None:
+    staging = path.with_name(f".{path.name}")
+    if output_format == 'csv':
+        df.to_csv(staging, index=False)
+    else:
+        df.to_parquet(staging, index=False, compression="zstd")
+    os.replace(staging, path)
+
+
+class StageCache:
+    """Parquet copies of stage outputs, each valid for one stage key."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        index = self.root / CACHE_INDEX
+        self.index = json.loads(index.read_text()) if index.exists() else {}
+
+    def path(self, stage: str) -> Path:
+        return self.root / f"{stage}.parquet"
+
+    def valid(self, stage: str, key: str) -> bool:
+        entry = self.index.get(stage)
+        return entry is not None and entry["key"] == key and self.path(stage).exists()
+
+    def stats(self, stage: str) -> dict:
+        return self.index[stage]["stats"]
+
+    def read(self, stage: str) -> pd.DataFrame:
+        return pd.read_parquet(self.path(stage))
+
+    def write(self, stage: str, key: str, data, stats: dict) -> None:
+        """
+        Stores a stage output: a DataFrame, or a callable writing the
+        Parquet file to the path it is given (e.g. SQLBatch.save_clean).
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(stage)
+        if callable(data):
+            staging = path.with_name(f".{path.name}")
+            data(staging)
+            os.replace(staging, path)
+        else:
+            _write_atomic(data, path, 'parquet')
+
+        # Index written last: an entry only exists once its file is complete
+        self.index[stage] = {"key": key, "stats": stats}
+        staging = self.root / f".{CACHE_INDEX}"
+        staging.write_text(json.dumps(self.index, indent=2))
+        os.replace(staging, self.root / CACHE_INDEX)
+
+
+def _stage_keys(data_path, locations_path, backend: str, params: dict) -> dict:
+    """
+    Cache key per stage. Each key includes the upstream one, so a changed
+    export invalidates everything and a changed ranking parameter only
+    invalidates rank.
+    """
+    # The DuckDB clean stage only keeps the columns scoring needs
+    clean = _key(_file_key(data_path), backend)
+    score = _key(clean, backend, params['stock_weight'], params['sell_through_weight'])
+    rank = _key(
+        score,
+        params['deadstock_threshold'],
+        params['transfer_weights'],
+        sorted(str(s) for s in params['exclude_stores'] or []),
+        _file_key(locations_path),
+        params['distance_weight']
+    )
+    return {"clean": clean, "score": score, "rank": rank}
+
+
+def _resume_point(cache: StageCache, keys: dict) -> str | None:
+    """The last cached stage the run can start after, if any."""
+    if cache.valid('rank', keys['rank']) and cache.valid('score', keys['score']):
+        return 'rank'
+    if cache.valid('score', keys['score']):
+        return 'score'
+    if cache.valid('clean', keys['clean']):
+        return 'clean'
+    return None
+
+
+def run_batch(
+    data_path,
+    output_dir,
+    locations_path=None,
+    backend: str = 'pandas',
+    threads: int = None,
+    memory_limit: str = None,
+    output_format: str = 'parquet',
+    resume: bool = False,
+    cache_stages: bool = False,
+    stock_weight: float = DEFAULT_STOCK_WEIGHT,
+    sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT,
+    deadstock_threshold: float = DEFAULT_DEADSTOCK_THRESHOLD,
+    transfer_weights: tuple = DEFAULT_TRANSFER_WEIGHTS,
+    exclude_stores=None,
+    distance_weight: float = DEFAULT_DISTANCE_WEIGHT
+) -> dict:
+    """
+    Runs the full pipeline once and writes outputs plus a run report.
+
+    Parameters:
+        data_path (str | Path): CSV/Parquet ERP export
+        output_dir (str | Path): Where outputs, report and cache are written
+        locations_path (str | Path, optional): Store locations file enabling
+            geography-aware ranking
+        backend (str): One of BACKENDS, used for scoring and ranking
+        threads (int, optional): DuckDB worker threads
+        memory_limit (str, optional): DuckDB memory limit, e.g. '8GB';
+            larger intermediates spill to the cache directory
+        output_format (str): One of FORMATS
+        resume (bool): Start after the last stage with a valid cached output
+            (implies cache_stages)
+        cache_stages (bool): Cache stage outputs for a later resume
+
+    Returns:
+        dict: The run report (also written to <output_dir>/report.json);
+        status is 'succeeded', 'invalid' (validation failed) or 'failed'
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of: {BACKENDS}")
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown format '{output_format}'. Expected one of: {FORMATS}")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache = StageCache(output_dir / CACHE_DIR)
+
+    params = {
+        'stock_weight': stock_weight,
+        'sell_through_weight': sell_through_weight,
+        'deadstock_threshold': deadstock_threshold,
+        'transfer_weights': list(transfer_weights),
+        'exclude_stores': exclude_stores,
+        'distance_weight': distance_weight
+    }
+    backend_options = {}
+    if backend == 'duckdb':
+        backend_options = {
+            'threads': threads,
+            'memory_limit': memory_limit,
+            'temp_directory': cache.root / "spill" if memory_limit else None
+        }
+        if memory_limit:
+            # DuckDB only creates the last path component itself
+            cache.root.mkdir(parents=True, exist_ok=True)
+
+    report = {
+        "status": "running",
+        "source": str(data_path),
+        "locations": str(locations_path) if locations_path else None,
+        "backend": backend,
+        "threads": threads,
+        "memory_limit": memory_limit,
+        "format": output_format,
+        "resumed_from": None,
+        "parameters": params,
+        "started": time.time(),
+        "stages": [],
+        "mismatches": {},
+        "outputs": {},
+        "error": None,
+        "failed_stage": None
+    }
+    stage = None
+    start = time.perf_counter()
+    write_cache = resume or cache_stages
+    sql = None
+
+    # Stats every cached stage carries, so a resumed run reports the same
+    # row and mismatch counts and ranks with the same store regions
+    carried = {"rows": {}, "mismatches": {}, "regions": None}
+
+    def record(name, began, rows, cached=False):
+        carried["rows"][name] = int(rows)
+        report["stages"].append({
+            "stage": name,
+            "seconds": round(time.perf_counter() - began, 4),
+            "rows": int(rows),
+            "cached": cached
+        })
+
+    try:
+        keys = _stage_keys(data_path, locations_path, backend, params)
+
+        resumed = _resume_point(cache, keys) if resume else None
+        report["resumed_from"] = resumed
+        done = STAGES[:STAGES.index(resumed) + 1] if resumed else []
+
+        if backend == 'duckdb':
+            # The export goes straight into DuckDB: validation, cleaning and
+            # scoring run in SQL under the memory limit, spilling as needed
+            sql = SQLBatch(**backend_options)
+
+        # ---------------------------------------------------------
+        # 1️⃣ Load → validate → clean (cached together as clean)
+        # ---------------------------------------------------------
+        inventory = None
+        if resumed:
+            stats = cache.stats(resumed)
+            carried.update(mismatches=stats["mismatches"], regions=stats["regions"])
+            began = time.perf_counter()
+            if resumed == 'clean' and sql is not None:
+                sql.load(cache.path('clean'))
+                sql.clean()
+            elif resumed == 'clean':
+                inventory = cache.read('clean')
+            for name in ['load', 'validate', 'clean']:
+                record(name, began, stats["rows"][name], cached=True)
+        elif sql is not None:
+            stage, began = 'load', time.perf_counter()
+            rows = sql.load(data_path)
+            record(stage, began, rows)
+
+            stage, began = 'validate', time.perf_counter()
+            sql.validate()
+            record(stage, began, rows)
+
+            stage, began = 'clean', time.perf_counter()
+            sql.clean()
+            stats = sql.stats()
+            carried.update(mismatches=stats["mismatches"], regions=stats["regions"])
+            record(stage, began, rows)
+            if write_cache:
+                cache.write('clean', keys['clean'], sql.save_clean, carried)
+        else:
+            stage, began = 'load', time.perf_counter()
+            inventory = read_export(str(data_path))
+            record(stage, began, len(inventory))
+
+            stage, began = 'validate', time.perf_counter()
+            validate_inventory_df(inventory)
+            record(stage, began, len(inventory))
+
+            stage, began = 'clean', time.perf_counter()
+            inventory = clean_inventory_df(inventory)
+            totals = reconcile_inventory(inventory).totals
+            carried["mismatches"] = {
+                "inventory_mismatch": int(inventory['inventory_mismatch'].sum()),
+                **{col: totals[col] for col in SUMMARY_COLUMNS if col != 'rows'}
+            }
+            if 'Region' in inventory.columns:
+                carried["regions"] = store_regions(inventory).astype(str).to_dict()
+            record(stage, began, len(inventory))
+            if write_cache:
+                cache.write('clean', keys['clean'], inventory, carried)
+        report["mismatches"] = carried["mismatches"]
+
+        # ---------------------------------------------------------
+        # 2️⃣ Score
+        # ---------------------------------------------------------
+        stage, began = 'score', time.perf_counter()
+        if 'score' in done:
+            scores = cache.read('score')
+            record(stage, began, len(scores), cached=True)
+        elif sql is not None:
+            scores = sql.score(stock_weight, sell_through_weight)
+            record(stage, began, len(scores))
+            if write_cache:
+                cache.write('score', keys['score'], scores, carried)
+        else:
+            scores = score_inventory(
+                inventory,
+                backend,
+                stock_weight=stock_weight,
+                sell_through_weight=sell_through_weight
+            )
+            record(stage, began, len(scores))
+            if write_cache:
+                cache.write('score', keys['score'], scores, carried)
+        del inventory
+        if sql is not None:
+            sql.close()
+            sql = None
+
+        # ---------------------------------------------------------
+        # 3️⃣ Rank
+        # ---------------------------------------------------------
+        stage, began = 'rank', time.perf_counter()
+        if 'rank' in done:
+            recs = cache.read('rank')
+            record(stage, began, len(recs), cached=True)
+        else:
+            distances = None
+            if locations_path is not None and Path(locations_path).exists():
+                regions = carried["regions"]
+                distances = build_distance_matrix(
+                    load_store_locations(locations_path),
+                    regions=pd.Series(regions) if regions else None
+                )
+            recs = rank_scores(
+                scores,
+                backend,
+                deadstock_threshold=deadstock_threshold,
+                transfer_weights=transfer_weights,
+                exclude_stores=exclude_stores,
+                store_distances=distances,
+                distance_weight=distance_weight,
+                **backend_options
+            )
+            record(stage, began, len(recs))
+            if write_cache:
+                cache.write('rank', keys['rank'], recs, carried)
+
+        # ---------------------------------------------------------
+        # 4️⃣ Outputs
+        # ---------------------------------------------------------
+        stage = None
+        for name, df in (("scores", scores), ("recommendations", recs)):
+            path = output_dir / f"{name}.{output_format}"
+            _write_atomic(df, path, output_format)
+            report["outputs"][name] = str(path)
+
+        report["status"] = "succeeded"
+
+    except Exception as e:
+        # Validation problems are the export's fault, not the run's
+        report["status"] = "invalid" if stage == 'validate' and isinstance(e, ValueError) else "failed"
+        report["error"] = f"{type(e).__name__}: {e}"
+        report["failed_stage"] = stage
+    finally:
+        if sql is not None:
+            sql.close()
+
+    report["finished"] = time.time()
+    report["seconds"] = round(time.perf_counter() - start, 4)
+    (output_dir / REPORT_FILE).write_text(json.dumps(report, indent=2, default=str))
+    return report
+
+
+def _limit_process_memory(limit: int) -> None:
+    """Caps the heap (RLIMIT_DATA) so pandas fails with MemoryError, not the OOM killer."""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return
+
+    _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m logic.batch")
+    parser.add_argument("data_path")
+    parser.add_argument("output_dir")
+    parser.add_argument("--locations", help="Store locations file (optional)")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas")
+    parser.add_argument("--threads", type=int, help="Worker threads for DuckDB and Arrow (default: all cores)")
+    parser.add_argument(
+        "--memory-limit",
+        help="e.g. 8GB. DuckDB spills beyond it; the pandas backend fails with MemoryError instead",
+    )
+    parser.add_argument("--format", choices=FORMATS, default="parquet", dest="output_format")
+    parser.add_argument("--cache", action="store_true", dest="cache_stages", help="Cache stage outputs for a later --resume")
+    parser.add_argument("--resume", action="store_true", help="Reuse cached stages whose inputs are unchanged (implies --cache)")
+    parser.add_argument("--stock-weight", type=float, default=DEFAULT_STOCK_WEIGHT)
+    parser.add_argument("--sell-through-weight", type=float, default=DEFAULT_SELL_THROUGH_WEIGHT)
+    parser.add_argument("--deadstock-threshold", type=float, default=DEFAULT_DEADSTOCK_THRESHOLD)
+    parser.add_argument(
+        "--transfer-weights",
+        type=float,
+        nargs=3,
+        default=DEFAULT_TRANSFER_WEIGHTS,
+        metavar=("DEADSTOCK", "STOCK", "DEMAND"),
+        help="Weights of source deadstock score, source stock and destination demand",
+    )
+    parser.add_argument("--distance-weight", type=float, default=DEFAULT_DISTANCE_WEIGHT)
+    parser.add_argument("--exclude-store", action="append", dest="exclude_stores", help="May be repeated")
+    args = parser.parse_args(argv)
+
+    if args.memory_limit:
+        try:
+            limit = parse_memory_limit(args.memory_limit)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.backend == 'pandas':
+            _limit_process_memory(limit)
+    if args.threads:
+        import pyarrow as pa
+
+        pa.set_cpu_count(args.threads)
+
+    report = run_batch(
+        args.data_path,
+        args.output_dir,
+        locations_path=args.locations,
+        backend=args.backend,
+        threads=args.threads,
+        memory_limit=args.memory_limit,
+        output_format=args.output_format,
+        resume=args.resume,
+        cache_stages=args.cache_stages,
+        stock_weight=args.stock_weight,
+        sell_through_weight=args.sell_through_weight,
+        deadstock_threshold=args.deadstock_threshold,
+        transfer_weights=tuple(args.transfer_weights),
+        exclude_stores=args.exclude_stores,
+        distance_weight=args.distance_weight
+    )
+
+    cached = [s["stage"] for s in report["stages"] if s["cached"]]
+    for s in report["stages"]:
+        print(f"{s['stage']:<9} {s['rows']:>12,} rows  {s['seconds']:8.2f} s{'  (cached)' if s['cached'] else ''}")
+    if report["status"] != "succeeded":
+        print(f"Batch {report['status']} at {report['failed_stage']}: {report['error']}", file=sys.stderr)
+        return EXIT_INVALID if report["status"] == "invalid" else EXIT_FAILED
+
+    print(f"Wrote {', '.join(report['outputs'].values())} in {report['seconds']:.2f} s"
+          + (f" (resumed after {cached[-1]})" if cached else ""))
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,367 @@
+"""
+Equivalence harness for alternative scoring / ranking engines.
+
+Generates randomised ERP frames (including edge cases such as zero stock,
+a single store, tied scores and no eligible sources), runs the reference
+pandas pipeline and a candidate engine on each, and checks that both
+produce the same scores and recommendations within a tolerance. Timings
+of both are recorded so performance work ships with correctness evidence.
+
+An engine is any callable taking a cleaned frame and returning a
+(scores, recommendations) tuple.
+
+Usage:
+    python -m logic.equivalence [scenario|duckdb]
+    python -m pytest tests/test_equivalence.py
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from logic.scoring import compute_deadstock_score
+from logic.ranking import get_redistribution_recommendations
+
+
+SCORE_KEYS = ['SKU', 'Store']
+RECOMMENDATION_KEYS = ['SKU', 'store_from', 'store_to']
+
+EDGE_CASES = [
+    'random',
+    'zero_stock',
+    'single_store',
+    'ties',
+    'no_sources',
+    'no_sales',
+    'single_row'
+]
+
+
+# ---------------------------------------------------------
+# Frame generation
+# ---------------------------------------------------------
+def generate_erp_frame(
+    rng: np.random.Generator,
+    case: str = 'random',
+    n_skus: int = None,
+    n_stores: int = None,
+    n_days: int = None
+) -> pd.DataFrame:
+    """
+    Generates a cleaned daily ERP frame for one edge case.
+
+    Parameters:
+        rng (np.random.Generator): Source of randomness
+        case (str): One of EDGE_CASES
+
+    Returns:
+        pd.DataFrame: Frame shaped like the output of clean_inventory_df()
+    """
+
+    if case not in EDGE_CASES:
+        raise ValueError(f"Unknown case '{case}'. Expected one of: {EDGE_CASES}")
+
+    n_skus = n_skus or int(rng.integers(1, 25))
+    n_stores = n_stores or int(rng.integers(2, 9))
+    n_days = n_days or int(rng.integers(1, 15))
+
+    if case == 'single_store':
+        n_stores = 1
+    elif case == 'single_row':
+        n_skus, n_stores, n_days = 1, 1, 1
+
+    skus = np.array([f"SKU{i:04d}" for i in range(n_skus)])
+    stores = np.array([f"Store {i}" for i in range(n_stores)])
+    dates = pd.date_range('2024-01-01', periods=n_days)
+
+    # Full SKU × Store × Date grid, then randomly drop some series rows
+    sku_idx, store_idx, day_idx = np.meshgrid(
+        np.arange(n_skus), np.arange(n_stores), np.arange(n_days), indexing='ij'
+    )
+    sku_idx, store_idx, day_idx = sku_idx.ravel(), store_idx.ravel(), day_idx.ravel()
+    size = len(sku_idx)
+
+    sales = rng.poisson(rng.uniform(0, 4), size=size)
+    closing = rng.integers(0, 60, size=size)
+
+    if case == 'zero_stock':
+        closing[rng.random(size) < 0.7] = 0
+    elif case == 'ties':
+        # Identical series across stores so scores and transfer scores tie
+        sales = rng.poisson(2, size=n_skus * n_days).reshape(n_skus, 1, n_days)
+        sales = np.broadcast_to(sales, (n_skus, n_stores, n_days)).ravel()
+        closing = np.full(size, 20)
+    elif case == 'no_sources':
+        closing = np.zeros(size, dtype=int)
+    elif case == 'no_sales':
+        sales = np.zeros(size, dtype=int)
+
+    replenishment = rng.integers(0, 5, size=size)
+    opening = np.maximum(closing + sales - replenishment, 0)
+
+    df = pd.DataFrame({
+        'Date': dates[day_idx],
+        'Store': stores[store_idx],
+        'SKU': skus[sku_idx],
+        'Opening_Stock': opening.astype(int),
+        'Replenishment': replenishment.astype(int),
+        'Sales': np.asarray(sales).astype(int),
+        'Closing_Stock': closing.astype(int)
+    })
+
+    if case == 'random' and len(df) > 1:
+        df = df[rng.random(len(df)) > 0.1]
+
+    return df.sort_values(['Date', 'Store', 'SKU']).reset_index(drop=True)
+
+
+def generate_cases(n_cases: int = 50, seed: int = 0):
+    """
+    Yields (case_name, frame) pairs, cycling through every edge case.
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(n_cases):
+        case = EDGE_CASES[i % len(EDGE_CASES)]
+        yield f"{case}#{i}", generate_erp_frame(rng, case)
+
+
+# ---------------------------------------------------------
+# Engines
+# ---------------------------------------------------------
+def reference_engine(df: pd.DataFrame, **params):
+    """The pandas pipeline every faster path must agree with."""
+    scores = compute_deadstock_score(
+        df,
+        **{k: params[k] for k in ('stock_weight', 'sell_through_weight') if k in params}
+    )
+    if params.get('demand_column') == 'forecast_daily_sales':
+        from logic.forecasting import add_demand_forecast
+        scores = add_demand_forecast(scores, df)
+
+    recs = get_redistribution_recommendations(
+        scores,
+        **{
+            k: params[k]
+            for k in (
+                'deadstock_threshold',
+                'transfer_weights',
+                'exclude_stores',
+                'demand_column',
+                'store_distances',
+                'distance_weight'
+            )
+            if k in params
+        }
+    )
+    return scores, recs
+
+
+def scenario_engine(df: pd.DataFrame, **params):
+    """ScenarioEngine adapter (cached aggregates + masked candidate pairs)."""
+    from logic.scenario import ScenarioEngine
+
+    engine = ScenarioEngine(
+        df,
+        demand_column=params.pop('demand_column', 'avg_daily_sales'),
+        store_distances=params.pop('store_distances', None)
+    )
+    result = engine.run(**params)
+    return result.scores, result.recommendations
+
+
+def duckdb_engine(df: pd.DataFrame, **params):
+    """DuckDB SQL backend adapter (see logic.backends)."""
+    from logic.backends import duckdb_pipeline
+
+    return duckdb_pipeline(df, **params)
+
+
+ENGINES = {
+    'scenario': scenario_engine,
+    'duckdb': duckdb_engine
+}
+
+
+# ---------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------
+@dataclass
+class EquivalenceResult:
+    case: str
+    rows: int
+    recommendations: int
+    equal: bool
+    max_abs_diff: float
+    reference_seconds: float
+    candidate_seconds: float
+    error: str = ''
+
+
+def _canonical(df: pd.DataFrame, keys: list) -> pd.DataFrame:
+    df = df.copy()
+    for key in keys:
+        df[key] = df[key].astype(str)
+    return df.sort_values(keys).reset_index(drop=True)
+
+
+def compare_frames(reference: pd.DataFrame, candidate: pd.DataFrame, keys: list, atol: float = 1e-9) -> float:
+    """
+    Checks that two frames hold the same rows (ignoring row order) and
+    returns the largest absolute difference across numeric columns.
+
+    Raises:
+        AssertionError: If keys, columns or values differ.
+    """
+
+    missing = set(reference.columns) - set(candidate.columns)
+    if missing:
+        raise AssertionError(f"Candidate is missing columns: {missing}")
+
+    if len(reference) != len(candidate):
+        raise AssertionError(
+            f"Row count differs: reference {len(reference)}, candidate {len(candidate)}"
+        )
+
+    if reference.empty:
+        return 0.0
+
+    ref = _canonical(reference, keys)
+    cand = _canonical(candidate[list(reference.columns)], keys)
+
+    if not ref[keys].equals(cand[keys]):
+        raise AssertionError(f"Key columns {keys} differ")
+
+    max_diff = 0.0
+    for col in ref.columns.difference(keys):
+        ref_values = pd.to_numeric(ref[col], errors='coerce').to_numpy(dtype=float)
+        cand_values = pd.to_numeric(cand[col], errors='coerce').to_numpy(dtype=float)
+        if not np.allclose(ref_values, cand_values, rtol=0, atol=atol, equal_nan=True):
+            raise AssertionError(f"Column '{col}' differs beyond atol={atol}")
+        if len(ref_values):
+            max_diff = max(max_diff, float(np.nanmax(np.abs(ref_values - cand_values), initial=0)))
+
+    return max_diff
+
+
+def _timed(engine, df, params, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = engine(df, **params)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+def run_equivalence(
+    candidate,
+    reference=reference_engine,
+    cases=None,
+    params: dict = None,
+    atol: float = 1e-9,
+    repeat: int = 1
+) -> pd.DataFrame:
+    """
+    Runs reference and candidate engines on every case and reports
+    equality and timings.
+
+    Parameters:
+        candidate (callable): Engine under test
+        reference (callable): Engine to compare against
+        cases (iterable, optional): (name, frame) pairs; defaults to
+            generate_cases()
+        params (dict, optional): Scenario parameters passed to both engines
+        atol (float): Absolute tolerance for numeric columns
+        repeat (int): Runs per engine per case; the best time is kept
+
+    Returns:
+        pd.DataFrame: One EquivalenceResult row per case
+    """
+
+    params = params or {}
+    cases = generate_cases() if cases is None else cases
+    results = []
+
+    for name, df in cases:
+        try:
+            (ref_scores, ref_recs), ref_time = _timed(reference, df, params, repeat)
+        except Exception as e:
+            # A broken case is a failure to report, not a reason to stop
+            results.append(EquivalenceResult(
+                case=name,
+                rows=len(df),
+                recommendations=0,
+                equal=False,
+                max_abs_diff=float('nan'),
+                reference_seconds=float('nan'),
+                candidate_seconds=float('nan'),
+                error=f"Reference failed: {type(e).__name__}: {e}"
+            ))
+            continue
+
+        try:
+            (cand_scores, cand_recs), cand_time = _timed(candidate, df, params, repeat)
+            diff = max(
+                compare_frames(ref_scores, cand_scores, SCORE_KEYS, atol),
+                compare_frames(ref_recs, cand_recs, RECOMMENDATION_KEYS, atol)
+            )
+            scores = cand_recs['transfer_score'].to_numpy(dtype=float)
+            if len(scores) and np.any(np.diff(scores) > atol):
+                raise AssertionError("Candidate recommendations are not sorted by transfer_score")
+            error = ''
+        except Exception as e:
+            cand_time, diff, error = float('nan'), float('nan'), f"{type(e).__name__}: {e}"
+
+        results.append(EquivalenceResult(
+            case=name,
+            rows=len(df),
+            recommendations=len(ref_recs),
+            equal=not error,
+            max_abs_diff=diff,
+            reference_seconds=ref_time,
+            candidate_seconds=cand_time,
+            error=error
+        ))
+
+    return pd.DataFrame([r.__dict__ for r in results])
+
+
+def assert_equivalent(candidate, **kwargs) -> pd.DataFrame:
+    """
+    Same as run_equivalence() but raises if any case differs.
+
+    Raises:
+        AssertionError: Listing every failing case.
+    """
+    report = run_equivalence(candidate, **kwargs)
+    failures = report[~report['equal']]
+    if not failures.empty:
+        details = '\n'.join(f"{r.case}: {r.error}" for r in failures.itertuples())
+        raise AssertionError(f"{len(failures)} case(s) differ from the reference:\n{details}")
+    return report
+
+
+def summarise_timings(report: pd.DataFrame) -> dict:
+    """Total reference vs candidate time and the overall speed-up."""
+    ref = float(report['reference_seconds'].sum())
+    cand = float(report['candidate_seconds'].sum())
+    return {
+        'cases': len(report),
+        'failures': int((~report['equal']).sum()),
+        'reference_seconds': ref,
+        'candidate_seconds': cand,
+        'speedup': ref / cand if cand > 0 else float('nan')
+    }
+
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else 'scenario'
+    if name not in ENGINES:
+        print(f"Usage: python -m logic.equivalence [{'|'.join(ENGINES)}]")
+        sys.exit(1)
+
+    report = assert_equivalent(ENGINES[name])
+    print(report.to_string(index=False))
+    print(summarise_timings(report))
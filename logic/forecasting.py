@@ -0,0 +1,455 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+SEASON_LENGTH = 7
+
+# Candidate level smoothing factors; each series keeps the one with the
+# lowest one-step-ahead squared error
+DEFAULT_ALPHAS = (0.1, 0.3, 0.5)
+
+
+def _series_codes(df: pd.DataFrame):
+    """
+    Returns (keys, codes) where keys holds one SKU–Store pair per series in
+    the same sorted order as aggregate_sku_store(), and codes maps every
+    row of df to its series.
+    """
+    codes = df.groupby(['SKU', 'Store'], sort=True).ngroup().to_numpy()
+    keys = (
+        df[['SKU', 'Store']]
+        .assign(_code=codes)
+        .drop_duplicates('_code')
+        .sort_values('_code')
+        .drop(columns='_code')
+        .reset_index(drop=True)
+    )
+    return keys, codes
+
+
+def _initial_state(y: np.ndarray, k: int, start_weekday: int) -> tuple:
+    """
+    Smoothing state before the first day of y, from its first (partial)
+    week, for k alphas.
+
+    Returns:
+        tuple: (level, trend, season, sse); season is slot-major
+        (SEASON_LENGTH, k, series) with slots indexed by weekday
+    """
+
+    n_days, n_series = y.shape
+    first_week = y[:min(SEASON_LENGTH, n_days)]
+    observed = ~np.isnan(first_week)
+    counts = observed.sum(axis=0)
+    level0 = np.where(
+        counts > 0,
+        np.where(observed, first_week, 0).sum(axis=0) / np.maximum(counts, 1),
+        0
+    ).astype(y.dtype)
+
+    # Season slots are indexed by weekday so the pattern lines up with
+    # dates; slot-major layout keeps each day's update contiguous
+    season0 = np.zeros((SEASON_LENGTH, n_series), dtype=y.dtype)
+    slots = (start_weekday + np.arange(len(first_week))) % SEASON_LENGTH
+    season0[slots] = np.where(observed, first_week - level0, 0)
+
+    level = np.broadcast_to(level0, (k, n_series)).copy()
+    trend = np.zeros((k, n_series), dtype=y.dtype)
+    season = np.broadcast_to(season0[:, None, :], (SEASON_LENGTH, k, n_series)).copy()
+    sse = np.zeros((k, n_series), dtype=np.float64)
+    return level, trend, season, sse
+
+
+def _smooth(
+    y: np.ndarray,
+    state: tuple,
+    alphas: tuple,
+    beta: float,
+    gamma: float,
+    phi: float,
+    weekday: int
+) -> tuple:
+    """
+    Runs the smoothing recursion over the days of y (weekday is that of
+    y[0]): loop over time, vectorised over series and alphas. Running two
+    consecutive slices of days gives exactly the state of one run over both.
+
+    Missing observations (NaN) are replaced by the one-step forecast, so
+    the state simply carries forward over gaps.
+    """
+
+    level, trend, season, sse = state
+    alpha = np.asarray(alphas, dtype=y.dtype)[:, None]        # (K, 1)
+
+    for t in range(len(y)):
+        slot = (weekday + t) % SEASON_LENGTH
+        s = season[slot]
+        forecast = level + phi * trend + s
+
+        obs = y[t]
+        missing = np.isnan(obs)
+        actual = np.where(missing, forecast, obs)
+
+        error = actual - forecast
+        sse += error * error
+
+        new_level = level + phi * trend + alpha * error
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        season[slot] = s + gamma * (actual - new_level - s)
+        level = new_level
+
+    return level, trend, season, sse
+
+
+def _project(state: tuple, alphas: tuple, phi: float, horizon: int, weekday: int) -> tuple:
+    """
+    Picks the best alpha per series and forecasts ahead from the state;
+    weekday is that of the first forecast day.
+
+    Returns:
+        tuple: (mean forecast over the next `horizon` days per series,
+        chosen alpha per series)
+    """
+
+    level, trend, season, sse = state
+    best = sse.argmin(axis=0)
+    rows = np.arange(sse.shape[1])
+    level = level[best, rows]
+    trend = trend[best, rows]
+    season = season[:, best, rows].T
+
+    steps = np.arange(1, horizon + 1)
+    damping = np.cumsum(phi ** steps).astype(level.dtype)
+    future_slots = (weekday - 1 + steps) % SEASON_LENGTH
+
+    path = (
+        level[:, None] +
+        trend[:, None] * damping[None, :] +
+        season[:, future_slots]
+    )
+
+    forecast = np.clip(path, 0, None).mean(axis=1)
+    return forecast, np.asarray(alphas)[best]
+
+
+def _holt_winters(
+    y: np.ndarray,
+    alphas: tuple,
+    beta: float,
+    gamma: float,
+    phi: float,
+    horizon: int,
+    start_weekday: int
+) -> tuple:
+    """
+    Additive exponential smoothing with damped trend and weekly
+    seasonality, run for every series (columns of the day-major array y)
+    and every alpha at once.
+
+    Returns:
+        tuple: (mean forecast over the next `horizon` days per series,
+        chosen alpha per series, final state)
+    """
+
+    state = _initial_state(y, len(alphas), start_weekday)
+    state = _smooth(y, state, alphas, beta, gamma, phi, start_weekday)
+    next_weekday = (start_weekday + len(y)) % SEASON_LENGTH
+    return (*_project(state, alphas, phi, horizon, next_weekday), state)
+
+
+def _day_major_batches(codes: np.ndarray, day: np.ndarray, sales: np.ndarray, n_series: int, n_days: int, batch_size: int, dtype):
+    """
+    Yields (first, last, y) per batch of series, where y is the
+    (n_days × batch) array of sales with NaN on days without a row.
+    """
+
+    # Rows grouped by series so each batch is one contiguous slice
+    order = np.argsort(codes, kind='stable')
+    codes, day, sales = codes[order], day[order], sales[order]
+
+    for first in range(0, n_series, batch_size):
+        last = min(first + batch_size, n_series)
+        lo, hi = np.searchsorted(codes, [first, last])
+
+        y = np.full((n_days, last - first), np.nan, dtype=dtype)
+        y[day[lo:hi], codes[lo:hi] - first] = sales[lo:hi]
+        yield first, last, y
+
+
+@dataclass
+class ForecastState:
+    """
+    Smoothing state of every SKU–Store series at the last day of the date
+    grid, kept for every alpha candidate since the per-series choice can
+    still change. Lets a long-running loader advance the forecast over new
+    days instead of replaying the whole history (see advance_forecast()).
+
+    Arrays are (alphas × series), season is (SEASON_LENGTH × alphas ×
+    series); series follow the sorted order of keys.
+    """
+    keys: pd.DataFrame
+    start: pd.Timestamp
+    end: pd.Timestamp
+    level: np.ndarray
+    trend: np.ndarray
+    season: np.ndarray
+    sse: np.ndarray
+    params: dict
+
+    def forecast(self) -> pd.DataFrame:
+        """Same output as forecast_demand() over the state's date grid."""
+        if self.keys.empty:
+            return pd.DataFrame(columns=['SKU', 'Store', 'forecast_daily_sales', 'forecast_alpha'])
+
+        weekday = (self.end + pd.Timedelta(days=1)).weekday()
+        forecast, chosen_alpha = _project(
+            (self.level, self.trend, self.season, self.sse),
+            self.params['alphas'], self.params['phi'], self.params['horizon'], weekday
+        )
+        return self.keys.assign(
+            forecast_daily_sales=forecast.astype(np.float64),
+            forecast_alpha=chosen_alpha
+        )
+
+    def update(self, other: 'ForecastState') -> 'ForecastState':
+        """
+        Returns a state with other's series added or replacing these ones.
+        Both states must cover the same date grid.
+        """
+
+        if (other.start, other.end) != (self.start, self.end):
+            raise ValueError(
+                f"Cannot merge forecast states over different date ranges: "
+                f"{self.start.date()}–{self.end.date()} and {other.start.date()}–{other.end.date()}"
+            )
+
+        keys = pd.concat([self.keys, other.keys], ignore_index=True)
+        keys = keys[~keys.duplicated(['SKU', 'Store'], keep='last')]
+        take = keys.sort_values(['SKU', 'Store'], kind='stable').index.to_numpy()
+
+        def merged(a, b):
+            return np.concatenate([a, b], axis=-1)[..., take]
+
+        return ForecastState(
+            keys=keys.loc[take].reset_index(drop=True),
+            start=self.start,
+            end=self.end,
+            level=merged(self.level, other.level),
+            trend=merged(self.trend, other.trend),
+            season=merged(self.season, other.season),
+            sse=merged(self.sse, other.sse),
+            params=self.params
+        )
+
+
+def _fit(df, horizon, alphas, beta, gamma, phi, batch_size, dtype, date_range, keep_state):
+    """
+    Shared body of forecast_demand() and fit_forecast(). Returns
+    (forecast DataFrame, ForecastState or None).
+    """
+
+    required_columns = {'SKU', 'Store', 'Date', 'Sales'}
+    if not required_columns.issubset(df.columns):
+        raise ValueError(f"Missing required columns: {required_columns}")
+
+    dates = pd.to_datetime(df['Date'])
+    start, end = date_range if date_range is not None else (dates.min(), dates.max())
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    params = {'horizon': horizon, 'alphas': tuple(alphas), 'beta': beta, 'gamma': gamma, 'phi': phi}
+
+    if df.empty:
+        state = ForecastState(
+            keys=pd.DataFrame(columns=['SKU', 'Store']),
+            start=start,
+            end=end,
+            level=np.empty((len(alphas), 0), dtype=dtype),
+            trend=np.empty((len(alphas), 0), dtype=dtype),
+            season=np.empty((SEASON_LENGTH, len(alphas), 0), dtype=dtype),
+            sse=np.empty((len(alphas), 0), dtype=np.float64),
+            params=params
+        )
+        return state.forecast(), state if keep_state else None
+
+    day = ((dates - start).dt.days).to_numpy()
+    n_days = (end - start).days + 1
+    start_weekday = start.weekday()
+
+    keys, codes = _series_codes(df)
+    sales = df['Sales'].to_numpy(dtype=dtype)
+
+    n_series = len(keys)
+    forecast = np.empty(n_series, dtype=dtype)
+    chosen_alpha = np.empty(n_series, dtype=np.float64)
+    states = []
+
+    for first, last, y in _day_major_batches(codes, day, sales, n_series, n_days, batch_size, dtype):
+        forecast[first:last], chosen_alpha[first:last], state = _holt_winters(
+            y, alphas, beta, gamma, phi, horizon, start_weekday
+        )
+        if keep_state:
+            states.append(state)
+
+    state = None
+    if keep_state:
+        level, trend, season, sse = (np.concatenate(parts, axis=-1) for parts in zip(*states))
+        state = ForecastState(keys, start, end, level, trend, season, sse, params)
+
+    return keys.assign(
+        forecast_daily_sales=forecast.astype(np.float64),
+        forecast_alpha=chosen_alpha
+    ), state
+
+
+def forecast_demand(
+    df: pd.DataFrame,
+    horizon: int = 14,
+    alphas: tuple = DEFAULT_ALPHAS,
+    beta: float = 0.05,
+    gamma: float = 0.1,
+    phi: float = 0.9,
+    batch_size: int = 250_000,
+    dtype=np.float32,
+    date_range: tuple = None
+) -> pd.DataFrame:
+    """
+    Forecasts daily sales velocity for every SKU–Store series.
+
+    Each series is a column of a 2-D (days × series) array covering the
+    full date range, and the smoothing recursion runs once per day over a
+    whole batch of series. Memory is bounded by batch_size × days.
+
+    Parameters:
+        df (pd.DataFrame): Cleaned daily ERP data (SKU, Store, Date, Sales)
+        horizon (int): Days ahead to average the forecast over
+        alphas (tuple): Level smoothing candidates, chosen per series
+        beta (float): Trend smoothing factor
+        gamma (float): Seasonal smoothing factor
+        phi (float): Trend damping factor
+        batch_size (int): Series processed per batch
+        date_range (tuple, optional): (first, last) dates of the series
+            grid; defaults to the range of df. Pass the full dataset's
+            range to forecast a subset of series exactly as in a full run.
+
+    Returns:
+        pd.DataFrame: SKU, Store, forecast_daily_sales, forecast_alpha
+    """
+
+    forecast, _ = _fit(df, horizon, alphas, beta, gamma, phi, batch_size, dtype, date_range, keep_state=False)
+    return forecast
+
+
+def fit_forecast(
+    df: pd.DataFrame,
+    horizon: int = 14,
+    alphas: tuple = DEFAULT_ALPHAS,
+    beta: float = 0.05,
+    gamma: float = 0.1,
+    phi: float = 0.9,
+    batch_size: int = 250_000,
+    dtype=np.float32,
+    date_range: tuple = None
+) -> ForecastState:
+    """
+    Runs forecast_demand() and keeps every series' final smoothing state,
+    so advance_forecast() can extend it to later days. The state costs
+    len(alphas) × (9 × dtype size + 8) bytes per series.
+
+    Parameters:
+        Same as forecast_demand()
+
+    Returns:
+        ForecastState: .forecast() gives the forecast_demand() output
+    """
+
+    _, state = _fit(df, horizon, alphas, beta, gamma, phi, batch_size, dtype, date_range, keep_state=True)
+    return state
+
+
+def advance_forecast(state: ForecastState, df: pd.DataFrame, end=None, batch_size: int = 250_000) -> ForecastState:
+    """
+    Advances a ForecastState over the days after state.end, giving exactly
+    the state fit_forecast() would return over the longer date grid. Costs
+    one smoothing step per new day and series instead of one per day of
+    history.
+
+    Series without rows in df carry their state forward over the new days;
+    series not in the state yet start from the all-zero state of a series
+    with no earlier observations.
+
+    Parameters:
+        state (ForecastState): State up to state.end
+        df (pd.DataFrame): Every row (SKU, Store, Date, Sales) dated after
+            state.end
+        end (optional): Last day of the new grid; defaults to df's last date
+        batch_size (int): Series processed per batch
+
+    Returns:
+        ForecastState: State up to `end`
+
+    Raises:
+        ValueError: If df has rows on or before state.end, or the state
+            covers less than a week (its initial state is still incomplete)
+    """
+
+    if (state.end - state.start).days + 1 < SEASON_LENGTH:
+        raise ValueError(
+            f"Forecast state covers fewer than {SEASON_LENGTH} days; refit it over the full range"
+        )
+
+    dates = pd.to_datetime(df['Date'])
+    if (dates <= state.end).any():
+        raise ValueError(f"Rows dated on or before {state.end.date()} need a refit of their series")
+
+    end = pd.Timestamp(end) if end is not None else (dates.max() if len(dates) else state.end)
+    n_days = (end - state.end).days
+    if n_days <= 0:
+        return state
+
+    # Unseen series join with the state of an all-missing history
+    new_keys = df[['SKU', 'Store']].drop_duplicates()
+    new_keys = new_keys[~pd.MultiIndex.from_frame(new_keys).isin(pd.MultiIndex.from_frame(state.keys))]
+    if len(new_keys):
+        k, n = len(state.params['alphas']), len(new_keys)
+        state = state.update(ForecastState(
+            keys=new_keys.reset_index(drop=True),
+            start=state.start,
+            end=state.end,
+            level=np.zeros((k, n), dtype=state.level.dtype),
+            trend=np.zeros((k, n), dtype=state.trend.dtype),
+            season=np.zeros((SEASON_LENGTH, k, n), dtype=state.season.dtype),
+            sse=np.zeros((k, n), dtype=np.float64),
+            params=state.params
+        ))
+
+    codes = pd.MultiIndex.from_frame(state.keys).get_indexer(pd.MultiIndex.from_frame(df[['SKU', 'Store']]))
+    day = ((dates - state.end).dt.days - 1).to_numpy()
+    dtype = state.level.dtype
+    sales = df['Sales'].to_numpy(dtype=dtype)
+
+    # _smooth() updates season and sse in place; the old state stays valid
+    level, trend = state.level.copy(), state.trend.copy()
+    season, sse = state.season.copy(), state.sse.copy()
+    weekday = (state.end + pd.Timedelta(days=1)).weekday()
+    p = state.params
+
+    for first, last, y in _day_major_batches(codes, day, sales, len(state.keys), n_days, batch_size, dtype):
+        batch = (level[:, first:last], trend[:, first:last], season[..., first:last], sse[:, first:last])
+        batch = _smooth(y, batch, p['alphas'], p['beta'], p['gamma'], p['phi'], weekday)
+        level[:, first:last], trend[:, first:last], season[..., first:last], sse[:, first:last] = batch
+
+    return ForecastState(state.keys, state.start, end, level, trend, season, sse, state.params)
+
+
+def add_demand_forecast(scores: pd.DataFrame, df: pd.DataFrame, **kwargs) -> pd.DataFrame:
+    """
+    Adds forecast_daily_sales to the output of compute_deadstock_score()
+    so it can be used as the destination demand in ranking.
+    """
+    forecast = forecast_demand(df, **kwargs)
+    return scores.merge(
+        forecast[['SKU', 'Store', 'forecast_daily_sales']],
+        on=['SKU', 'Store'],
+        how='left'
+    ).fillna({'forecast_daily_sales': 0.0})
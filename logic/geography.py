@@ -0,0 +1,270 @@
+from collections import defaultdict
+from itertools import product
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+EARTH_RADIUS_KM = 6371.0
+
+DEFAULT_NEIGHBOURS = 10
+
+LOCATION_COLUMNS = ['Store', 'Latitude', 'Longitude']
+
+DISTANCE_COLUMNS = ['store_from', 'store_to', 'distance_km', 'transport_cost']
+
+
+def load_store_locations(source) -> pd.DataFrame:
+    """
+    Loads and standardises store coordinates.
+
+    Parameters:
+        source (str | Path | pd.DataFrame): CSV path or frame with Store,
+            Latitude and Longitude columns (Region is optional)
+
+    Returns:
+        pd.DataFrame: One row per Store with Store names standardised the
+        same way as clean_inventory_df()
+    """
+
+    df = pd.read_csv(source) if isinstance(source, (str, Path)) else source.copy()
+
+    missing_cols = set(LOCATION_COLUMNS) - set(df.columns)
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+
+    df['Store'] = df['Store'].astype(str).str.strip().str.title()
+    if 'Region' in df.columns:
+        df['Region'] = df['Region'].astype(str).str.strip().str.title()
+
+    for col in ['Latitude', 'Longitude']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    if df[['Latitude', 'Longitude']].isnull().any().any():
+        raise ValueError("Missing or non-numeric store coordinates detected.")
+
+    if not df['Latitude'].between(-90, 90).all() or not df['Longitude'].between(-180, 180).all():
+        raise ValueError("Store coordinates out of range.")
+
+    return df.drop_duplicates('Store', keep='last').reset_index(drop=True)
+
+
+def store_regions(inventory: pd.DataFrame) -> pd.Series:
+    """Region per Store taken from cleaned ERP data (first seen wins)."""
+    return inventory.drop_duplicates('Store').set_index('Store')['Region']
+
+
+def _unit_vectors(lat, lon) -> np.ndarray:
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    return np.column_stack([
+        np.cos(lat) * np.cos(lon),
+        np.cos(lat) * np.sin(lon),
+        np.sin(lat)
+    ])
+
+
+def _chord_to_km(chord):
+    # Great-circle distance from the straight-line distance on a unit sphere
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+
+
+class GridIndex:
+    """
+    Uniform 3-D grid over store positions on the unit sphere.
+
+    Working on unit vectors avoids latitude distortion: straight-line
+    (chord) distance is monotonic in great-circle distance, so nearest
+    neighbours by chord are exact. A k-nearest query scans cubes of cells of
+    growing radius and stops once every unscanned cell is provably farther
+    than the current k-th neighbour.
+    """
+
+    def __init__(self, points: np.ndarray, cell_size: float = None):
+        self.points = np.asarray(points, dtype=float)
+        n = len(self.points)
+
+        if cell_size is None:
+            extent = float(np.ptp(self.points, axis=0).max()) if n > 1 else 1.0
+            # Roughly a couple of stores per occupied cell
+            cell_size = max(extent / max(np.sqrt(n / 2), 1), 1e-6)
+        self.cell_size = cell_size
+
+        self.cells = np.floor(self.points / cell_size).astype(np.int64)
+        self._buckets = defaultdict(list)
+        for i, cell in enumerate(map(tuple, self.cells)):
+            self._buckets[cell].append(i)
+        self._buckets = {cell: np.array(ids) for cell, ids in self._buckets.items()}
+        self._max_radius = int(np.ptp(self.cells, axis=0).max()) + 1 if n else 0
+
+    def _shell(self, centre, radius):
+        """Cells on the surface of the cube of the given radius."""
+        if radius == 0:
+            yield centre
+            return
+        span = range(-radius, radius + 1)
+        for offset in product(span, span, span):
+            if max(abs(o) for o in offset) == radius:
+                yield (centre[0] + offset[0], centre[1] + offset[1], centre[2] + offset[2])
+
+    def query(self, i: int, k: int) -> tuple:
+        """
+        Returns (indices, chord distances) of the k nearest points to point
+        i, excluding i itself, ordered by distance.
+        """
+        centre = tuple(self.cells[i])
+        found = []
+        radius = 0
+
+        while radius <= self._max_radius:
+            for cell in self._shell(centre, radius):
+                ids = self._buckets.get(cell)
+                if ids is not None:
+                    found.append(ids)
+
+            candidates = np.concatenate(found) if found else np.empty(0, dtype=int)
+            candidates = candidates[candidates != i]
+            if len(candidates) >= k:
+                dist = np.linalg.norm(self.points[candidates] - self.points[i], axis=1)
+                kth = np.partition(dist, k - 1)[k - 1]
+                # Everything within radius * cell_size has been scanned
+                if kth <= radius * self.cell_size:
+                    break
+            radius += 1
+
+        candidates = np.concatenate(found) if found else np.empty(0, dtype=int)
+        candidates = candidates[candidates != i]
+        dist = np.linalg.norm(self.points[candidates] - self.points[i], axis=1)
+        order = np.argsort(dist, kind='stable')[:k]
+        return candidates[order], dist[order]
+
+
+def build_distance_matrix(
+    locations: pd.DataFrame,
+    k: int = DEFAULT_NEIGHBOURS,
+    regions: pd.Series = None,
+    cost_per_km: float = 1.0
+) -> pd.DataFrame:
+    """
+    Precomputes a sparse store-to-store distance/cost matrix holding the K
+    nearest stores within the same Region for every store.
+
+    Every located store also gets a zero-distance row to itself, so a
+    store alone in its region still shows up as located (and matched with
+    nothing) instead of looking like a store without coordinates. Ranking
+    drops same-store pairs anyway.
+
+    Parameters:
+        locations (pd.DataFrame): Output of load_store_locations()
+        k (int): Neighbours kept per store
+        regions (pd.Series, optional): Region per Store; overrides a Region
+            column in locations. Without either, all stores share one region.
+        cost_per_km (float): Transport cost per km
+
+    Returns:
+        pd.DataFrame: store_from, store_to, distance_km, transport_cost
+    """
+
+    locations = locations.copy()
+    if regions is not None:
+        locations['Region'] = locations['Store'].map(regions)
+    if 'Region' not in locations.columns:
+        locations['Region'] = ''
+    locations['Region'] = locations['Region'].fillna('')
+
+    parts = [pd.DataFrame({
+        'store_from': locations['Store'],
+        'store_to': locations['Store'],
+        'distance_km': 0.0,
+        'transport_cost': 0.0
+    })]
+    for _, group in locations.groupby('Region', sort=False):
+        if len(group) < 2:
+            continue
+
+        points = _unit_vectors(group['Latitude'], group['Longitude'])
+        index = GridIndex(points)
+        stores = group['Store'].to_numpy()
+        neighbours = min(k, len(group) - 1)
+
+        src, dst, chord = [], [], []
+        for i in range(len(group)):
+            ids, dist = index.query(i, neighbours)
+            src.append(np.full(len(ids), i))
+            dst.append(ids)
+            chord.append(dist)
+
+        src, dst, chord = np.concatenate(src), np.concatenate(dst), np.concatenate(chord)
+        distance = _chord_to_km(chord)
+        parts.append(pd.DataFrame({
+            'store_from': stores[src],
+            'store_to': stores[dst],
+            'distance_km': distance,
+            'transport_cost': distance * cost_per_km
+        }))
+
+    return pd.concat(parts, ignore_index=True)[DISTANCE_COLUMNS]
+
+
+def match_nearby(
+    source: pd.DataFrame,
+    dest: pd.DataFrame,
+    store_distances: pd.DataFrame,
+    suffixes: tuple = ('_source', '_dest')
+) -> pd.DataFrame:
+    """
+    Matches sources (store_from) with destinations (store_to) of the same
+    SKU, keeping only the precomputed nearest stores, so two located
+    stores are never paired across regions.
+
+    Stores without coordinates (no store_from row in store_distances)
+    cannot be pruned by distance, so every pair involving one of them
+    keeps plain same-SKU matching with distance_km left NaN; ranking
+    penalises those pairs as if they were the farthest transfer.
+
+    Parameters:
+        source (pd.DataFrame): Candidate sources with SKU and store_from
+        dest (pd.DataFrame): Candidate destinations with SKU and store_to
+        store_distances (pd.DataFrame): Output of build_distance_matrix()
+        suffixes (tuple): Suffixes for overlapping source/dest columns
+
+    Returns:
+        pd.DataFrame: Matched pairs including distance_km
+    """
+    located = pd.Index(store_distances['store_from']).unique()
+    located_source = source['store_from'].isin(located)
+    located_dest = dest['store_to'].isin(located)
+
+    # The join grows with K rather than with the number of stores
+    nearby = pd.merge(
+        source[located_source].merge(
+            store_distances[['store_from', 'store_to', 'distance_km']],
+            on='store_from'
+        ),
+        dest[located_dest],
+        on=['SKU', 'store_to'],
+        suffixes=suffixes
+    )
+
+    unlocated = pd.concat([
+        pd.merge(source[~located_source], dest, on='SKU', suffixes=suffixes),
+        pd.merge(source[located_source], dest[~located_dest], on='SKU', suffixes=suffixes)
+    ], ignore_index=True)
+    unlocated['distance_km'] = np.nan
+
+    return pd.concat([nearby, unlocated[nearby.columns]], ignore_index=True)
+
+
+def load_store_distances(path, inventory: pd.DataFrame = None, k: int = DEFAULT_NEIGHBOURS):
+    """
+    Builds the distance matrix from an optional store-locations file.
+
+    Returns:
+        pd.DataFrame | None: None when no locations file exists
+    """
+    if path is None or not Path(path).exists():
+        return None
+
+    regions = store_regions(inventory) if inventory is not None and 'Region' in inventory.columns else None
+    return build_distance_matrix(load_store_locations(path), k=k, regions=regions)
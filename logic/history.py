@@ -0,0 +1,214 @@
+"""
+Append-only history of scores and recommendations, keyed by dataset
+version.
+
+Every published snapshot version (see logic.snapshot) also appends its
+scores and recommendations here as zstd-compressed Parquet. Snapshot
+versions are pruned; history is not. Each row carries a 64-bit hash of
+its key (SKU, Store for scores; SKU, store_from, store_to for
+recommendations) and files are sorted by that hash, so a diff reads only
+the hash and value columns of two versions, hash-joins them, and then
+fetches key columns just for the changed rows — row groups without a
+changed hash are skipped via Parquet statistics.
+
+Layout:
+    <root>/<table>/<version>.parquet
+    <root>/versions.jsonl               -> one line per recorded version
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+INDEX_FILE = "versions.jsonl"
+
+# table -> (key columns, value compared between versions)
+TABLES = {
+    "scores": (['SKU', 'Store'], 'deadstock_score'),
+    "recommendations": (['SKU', 'store_from', 'store_to'], 'transfer_score')
+}
+
+HASH_COLUMN = "key_hash"
+
+ROW_GROUP_SIZE = 64_000
+
+CHANGE_TYPES = ['added', 'dropped', 'changed']
+
+
+def _parquet():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    return pa, pq
+
+
+def key_hash(df: pd.DataFrame, keys: list) -> np.ndarray:
+    """64-bit hash of each row's key columns."""
+    return pd.util.hash_pandas_object(df[keys].astype(str), index=False).to_numpy()
+
+
+def _path(root, table: str, version: str) -> Path:
+    return Path(root) / table / f"{version}.parquet"
+
+
+def list_versions(root) -> pd.DataFrame:
+    """Recorded versions, oldest first."""
+    index = Path(root) / INDEX_FILE
+    if not index.exists():
+        return pd.DataFrame(columns=['version', 'created'])
+    with open(index) as f:
+        return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def record_history(root, version: str, frames: dict, metadata: dict = None) -> bool:
+    """
+    Appends the history tables found in `frames` under `version`.
+
+    Parameters:
+        root (str | Path): History directory
+        version (str): Dataset version id
+        frames (dict): Table name -> DataFrame; only TABLES are recorded
+        metadata (dict, optional): Extra fields for the index line
+
+    Returns:
+        bool: False if the version was already recorded
+    """
+
+    pa, pq = _parquet()
+    root = Path(root)
+    if (root / INDEX_FILE).exists() and version in set(list_versions(root)['version']):
+        return False
+
+    rows = {}
+    for table, (keys, _) in TABLES.items():
+        if table not in frames:
+            continue
+
+        df = frames[table].reset_index(drop=True)
+        hashes = key_hash(df, keys)
+        order = np.argsort(hashes, kind='stable')
+        df = df.take(order).assign(**{HASH_COLUMN: hashes[order]})
+
+        path = _path(root, table, version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = path.with_name(f".{path.name}")
+        pq.write_table(
+            pa.Table.from_pandas(df, preserve_index=False),
+            staging,
+            compression="zstd",
+            row_group_size=ROW_GROUP_SIZE
+        )
+        os.replace(staging, path)
+        rows[table] = len(df)
+
+    # Written last: a version is only listed once its files are complete
+    entry = {"version": version, "created": time.time(), "rows": rows, **(metadata or {})}
+    with open(root / INDEX_FILE, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+    return True
+
+
+def load_history(root, version: str, table: str = "recommendations", columns: list = None) -> pd.DataFrame:
+    """Reads one recorded table, ordered by descending value like the original."""
+    _, pq = _parquet()
+    keys, value = TABLES[table]
+
+    df = pq.read_table(_path(root, table, version), columns=columns).to_pandas()
+    if value in df.columns:
+        df = df.sort_values(value, ascending=False, kind='stable')
+    return df.drop(columns=HASH_COLUMN, errors='ignore').reset_index(drop=True)
+
+
+def _read_rows(root, table: str, version: str, columns: list, hashes: np.ndarray) -> pd.DataFrame:
+    pa, pq = _parquet()
+    import pyarrow.compute as pc
+
+    if len(hashes) == 0:
+        return pd.DataFrame(columns=columns)
+    return pq.read_table(
+        _path(root, table, version),
+        columns=columns,
+        filters=pc.field(HASH_COLUMN).isin(pa.array(hashes, type=pa.uint64()))
+    ).to_pandas()
+
+
+def diff_versions(
+    root,
+    old: str,
+    new: str,
+    table: str = "recommendations",
+    atol: float = 1e-9
+) -> pd.DataFrame:
+    """
+    Rows added, dropped or changed in value between two versions.
+
+    Parameters:
+        root (str | Path): History directory
+        old (str): Baseline version
+        new (str): Version compared against the baseline
+        table (str): One of TABLES
+        atol (float): Value changes up to this size are ignored
+
+    Returns:
+        pd.DataFrame: Key columns, change ('added' | 'dropped' |
+        'changed'), <value>_old, <value>_new and delta, largest moves
+        first within each change type
+    """
+
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}'. Expected one of: {list(TABLES)}")
+
+    _, pq = _parquet()
+    keys, value = TABLES[table]
+
+    # ---------------------------------------------------------
+    # 1️⃣ Hash join on key hashes + values only
+    # ---------------------------------------------------------
+    before = pq.read_table(_path(root, table, old), columns=[HASH_COLUMN, value]).to_pandas()
+    after = pq.read_table(_path(root, table, new), columns=[HASH_COLUMN, value]).to_pandas()
+
+    joined = before.merge(after, on=HASH_COLUMN, how='outer', suffixes=('_old', '_new'), indicator=True)
+    joined['change'] = joined['_merge'].map({'left_only': 'dropped', 'right_only': 'added', 'both': 'changed'})
+    joined = joined.drop(columns='_merge')
+
+    moved = (joined[f'{value}_new'] - joined[f'{value}_old']).abs() > atol
+    joined = joined[(joined['change'] != 'changed') | moved]
+
+    # ---------------------------------------------------------
+    # 2️⃣ Fetch key columns for the changed rows only
+    # ---------------------------------------------------------
+    hashes = joined[HASH_COLUMN].to_numpy()
+    dropped = joined.loc[joined['change'] == 'dropped', HASH_COLUMN].to_numpy()
+    current = np.setdiff1d(hashes, dropped)
+
+    key_rows = pd.concat([
+        _read_rows(root, table, new, keys + [HASH_COLUMN], current),
+        _read_rows(root, table, old, keys + [HASH_COLUMN], dropped)
+    ], ignore_index=True)
+
+    result = joined.merge(key_rows, on=HASH_COLUMN, how='left')
+    result['delta'] = result[f'{value}_new'] - result[f'{value}_old']
+    result['change'] = pd.Categorical(result['change'], categories=CHANGE_TYPES)
+
+    # ---------------------------------------------------------
+    # 3️⃣ Largest moves first
+    # ---------------------------------------------------------
+    magnitude = result['delta'].abs().fillna(result[f'{value}_new'].fillna(result[f'{value}_old']))
+    result = (
+        result.assign(_magnitude=magnitude)
+        .sort_values(['change', '_magnitude'], ascending=[True, False], kind='stable')
+        .drop(columns=['_magnitude', HASH_COLUMN])
+    )
+
+    return result[keys + ['change', f'{value}_old', f'{value}_new', 'delta']].reset_index(drop=True)
+
+
+def summarise_diff(diff: pd.DataFrame) -> dict:
+    """Count of rows per change type."""
+    counts = diff['change'].value_counts()
+    return {change: int(counts.get(change, 0)) for change in CHANGE_TYPES}
@@ -4,8 +4,15 @@ from logic.data_validation import validate_inventory_df
 from logic.data_cleaning import clean_inventory_df
 
 
+def read_export(path: str) -> pd.DataFrame:
+    """Reads a raw CSV or Parquet ERP export without validating it."""
+    if str(path).lower().endswith(('.parquet', '.pq')):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
 def load_inventory(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+    df = read_export(path)
 
     validate_inventory_df(df)
     df = clean_inventory_df(df)
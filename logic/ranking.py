@@ -1,21 +1,57 @@
 import pandas as pd
 import numpy as np
 
+from logic.geography import match_nearby
 
-def get_redistribution_recommendations(df: pd.DataFrame) -> pd.DataFrame:
+
+DEFAULT_DEADSTOCK_THRESHOLD = 0.6
+
+# (deadstock_score, normalized source stock, normalized destination demand)
+DEFAULT_TRANSFER_WEIGHTS = (0.5, 0.3, 0.2)
+
+RECOMMENDATION_COLUMNS = ['SKU', 'store_from', 'store_to', 'transfer_score']
+
+# Penalty on the transfer score for the farthest candidate destination
+DEFAULT_DISTANCE_WEIGHT = 0.2
+
+
+def get_redistribution_recommendations(
+    df: pd.DataFrame,
+    deadstock_threshold: float = DEFAULT_DEADSTOCK_THRESHOLD,
+    transfer_weights: tuple = DEFAULT_TRANSFER_WEIGHTS,
+    exclude_stores=None,
+    demand_column: str = 'avg_daily_sales',
+    store_distances: pd.DataFrame = None,
+    distance_weight: float = DEFAULT_DISTANCE_WEIGHT
+) -> pd.DataFrame:
     """
     Generates redistribution recommendations by matching
     high-deadstock stores with higher-demand stores for the same SKU.
 
     Parameters:
         df (pd.DataFrame): Output of compute_deadstock_score()
+        deadstock_threshold (float): Minimum deadstock_score for a source store
+        transfer_weights (tuple): Weights of deadstock score, source stock
+            and destination demand in the transfer score
+        exclude_stores (iterable, optional): Stores to leave out as both
+            source and destination
+        demand_column (str): Destination demand measure, e.g.
+            'forecast_daily_sales' from logic.forecasting
+        store_distances (pd.DataFrame, optional): Output of
+            logic.geography.build_distance_matrix(); restricts destinations
+            to each source's nearest same-region stores and adds a
+            transport-cost penalty. Stores without coordinates are matched
+            with every same-SKU store at the maximum distance penalty.
+        distance_weight (float): Weight of the normalized distance penalty
 
     Returns:
         pd.DataFrame: Ranked redistribution recommendations with:
             - SKU
             - store_from
             - store_to
-            - transfer_score
+            - transfer_score (clamped at 0)
+            - distance_km (only with store_distances; NaN for stores
+              without coordinates)
     """
 
     # ---------------------------------------------------------
@@ -26,7 +62,8 @@ def get_redistribution_recommendations(df: pd.DataFrame) -> pd.DataFrame:
         'Store',
         'current_stock',
         'avg_daily_sales',
-        'deadstock_score'
+        'deadstock_score',
+        demand_column
     }
 
     if not required_columns.issubset(df.columns):
@@ -34,16 +71,17 @@ def get_redistribution_recommendations(df: pd.DataFrame) -> pd.DataFrame:
             f"Input DataFrame must contain columns: {required_columns}"
         )
 
+    if exclude_stores:
+        df = df[~df['Store'].isin(list(exclude_stores))]
+
     if df.empty:
-        return pd.DataFrame(
-            columns=['SKU', 'store_from', 'store_to', 'transfer_score']
-        )
+        return pd.DataFrame(columns=RECOMMENDATION_COLUMNS)
 
     # ---------------------------------------------------------
     # 1️⃣ Identify source stores (high deadstock risk)
     # ---------------------------------------------------------
     source = df[
-        (df['deadstock_score'] >= 0.6) &
+        (df['deadstock_score'] >= deadstock_threshold) &
         (df['current_stock'] > 0)
     ].rename(columns={'Store': 'store_from'})
 
@@ -51,33 +89,60 @@ def get_redistribution_recommendations(df: pd.DataFrame) -> pd.DataFrame:
     # 2️⃣ Identify destination stores (higher sales velocity)
     # ---------------------------------------------------------
     dest = df[
-        df['avg_daily_sales'] > 0
+        df[demand_column] > 0
     ].rename(columns={'Store': 'store_to'})
 
     if source.empty or dest.empty:
-        return pd.DataFrame(
-            columns=['SKU', 'store_from', 'store_to', 'transfer_score']
-        )
+        return pd.DataFrame(columns=RECOMMENDATION_COLUMNS)
 
     # ---------------------------------------------------------
     # 3️⃣ Match source → destination by SKU
     # ---------------------------------------------------------
-    recs = pd.merge(
-        source,
-        dest,
-        on='SKU',
-        suffixes=('_source', '_dest')
-    )
+    if store_distances is not None:
+        # Only the precomputed nearest stores are candidate destinations;
+        # stores without coordinates fall back to plain SKU matching
+        recs = match_nearby(source, dest, store_distances)
+    else:
+        recs = pd.merge(
+            source,
+            dest,
+            on='SKU',
+            suffixes=('_source', '_dest')
+        )
 
     # Exclude same-store transfers
     recs = recs[
         recs['store_from'] != recs['store_to']
     ]
 
+    return score_transfers(recs, transfer_weights, demand_column, distance_weight)
+
+
+def score_transfers(
+    recs: pd.DataFrame,
+    transfer_weights: tuple = DEFAULT_TRANSFER_WEIGHTS,
+    demand_column: str = 'avg_daily_sales',
+    distance_weight: float = DEFAULT_DISTANCE_WEIGHT
+) -> pd.DataFrame:
+    """
+    Scores matched source → destination pairs and ranks them.
+
+    Parameters:
+        recs (pd.DataFrame): Matched pairs with SKU, store_from, store_to,
+            current_stock_source, <demand_column>_dest and
+            deadstock_score_source columns, plus distance_km when
+            geography is used
+
+    Returns:
+        pd.DataFrame: SKU, store_from, store_to, transfer_score sorted
+        by descending transfer_score
+    """
+
     if recs.empty:
-        return pd.DataFrame(
-            columns=['SKU', 'store_from', 'store_to', 'transfer_score']
-        )
+        return pd.DataFrame(columns=RECOMMENDATION_COLUMNS)
+
+    recs = recs.copy()
+    deadstock_weight, stock_weight, demand_weight = transfer_weights
 
     # ---------------------------------------------------------
     # 4️⃣ Normalize components for scoring
@@ -89,27 +154,44 @@ def get_redistribution_recommendations(df: pd.DataFrame) -> pd.DataFrame:
         else 0
     )
 
+    demand = recs[f'{demand_column}_dest']
     recs['norm_demand'] = (
-        recs['avg_daily_sales_dest'] /
-        recs['avg_daily_sales_dest'].max()
-        if recs['avg_daily_sales_dest'].max() > 0
+        demand / demand.max()
+        if demand.max() > 0
         else 0
     )
 
     # ---------------------------------------------------------
-    # 5️⃣ Transfer score (0–1, interpretable)
+    # 5️⃣ Transfer score (0–1 for weights summing to 1)
     # ---------------------------------------------------------
     recs['transfer_score'] = (
-        0.5 * recs['deadstock_score_source'] +
-        0.3 * recs['norm_stock'] +
-        0.2 * recs['norm_demand']
+        deadstock_weight * recs['deadstock_score_source'] +
+        stock_weight * recs['norm_stock'] +
+        demand_weight * recs['norm_demand']
     )
 
+    output_columns = RECOMMENDATION_COLUMNS
+
+    if 'distance_km' in recs.columns:
+        # Transport cost: farther transfers score lower; an unknown
+        # distance (store without coordinates) costs as much as the farthest
+        distance = recs['distance_km']
+        recs['norm_distance'] = (
+            distance / distance.max()
+            if distance.max() > 0
+            else distance * 0
+        ).fillna(1)
+        # The penalty may not push a transfer below the 0 floor
+        recs['transfer_score'] = (
+            recs['transfer_score'] - distance_weight * recs['norm_distance']
+        ).clip(lower=0)
+        output_columns = RECOMMENDATION_COLUMNS + ['distance_km']
+
     # ---------------------------------------------------------
     # 6️⃣ Final output
     # ---------------------------------------------------------
     result = (
-        recs[['SKU', 'store_from', 'store_to', 'transfer_score']]
+        recs[output_columns]
         .sort_values('transfer_score', ascending=False)
         .reset_index(drop=True)
     )
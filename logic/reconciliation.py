@@ -0,0 +1,212 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from logic.data_cleaning import clean_inventory_df
+
+
+KEY_COLUMNS = ['SKU', 'Store']
+
+RECONCILIATION_COLUMNS = [
+    'Date',
+    'Store',
+    'SKU',
+    'Opening_Stock',
+    'Replenishment',
+    'Sales',
+    'Closing_Stock'
+]
+
+SUMMARY_COLUMNS = [
+    'rows',
+    'balance_mismatches',
+    'balance_abs_delta',
+    'continuity_breaks',
+    'continuity_abs_delta',
+    'missing_days'
+]
+
+
+@dataclass
+class ReconciliationReport:
+    """
+    Compact summary of where ERP stock figures don't add up.
+
+    - balance: Opening + Replenishment - Sales != Closing on the same day
+    - continuity: a day's Opening != the previous day's Closing for the
+      same SKU × Store
+    """
+
+    by_store: pd.DataFrame
+    by_sku: pd.DataFrame
+
+    @property
+    def totals(self) -> dict:
+        totals = self.by_store[SUMMARY_COLUMNS].sum()
+        return {col: int(totals[col]) for col in SUMMARY_COLUMNS}
+
+
+def compute_balance_deltas(df: pd.DataFrame, previous: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Computes per-row balance and continuity deltas with vectorised
+    shifted comparisons.
+
+    Parameters:
+        df (pd.DataFrame): Cleaned daily ERP data
+        previous (pd.DataFrame, optional): Last known Date and
+            Closing_Stock per SKU × Store (indexed by SKU, Store), used to
+            check continuity across chunk boundaries
+
+    Returns:
+        pd.DataFrame: SKU, Store, Date, balance_delta, continuity_delta
+        (NaN where there is no previous day) and missing_days
+    """
+
+    # ---------------------------------------------------------
+    # 1️⃣ Same-day balance: Opening + Replenishment - Sales = Closing
+    # ---------------------------------------------------------
+    rows = df[KEY_COLUMNS + ['Date', 'Opening_Stock', 'Closing_Stock']].assign(
+        balance_delta=(
+            df['Closing_Stock'] -
+            (df['Opening_Stock'] + df['Replenishment'] - df['Sales'])
+        )
+    )
+
+    # ---------------------------------------------------------
+    # 2️⃣ Day-to-day continuity: Opening = previous Closing
+    # ---------------------------------------------------------
+    rows = rows.sort_values(KEY_COLUMNS + ['Date'], kind='stable')
+
+    sku = rows['SKU'].to_numpy()
+    store = rows['Store'].to_numpy()
+    same_key = np.zeros(len(rows), dtype=bool)
+    same_key[1:] = (sku[1:] == sku[:-1]) & (store[1:] == store[:-1])
+
+    prev_closing = rows['Closing_Stock'].shift(1).where(same_key)
+    prev_date = rows['Date'].shift(1).where(same_key)
+
+    if previous is not None and not previous.empty:
+        # First row of each key in this chunk continues the carried state
+        first = ~same_key
+        carried = previous.reindex(pd.MultiIndex.from_arrays([sku[first], store[first]]))
+        carried_date = pd.Series(carried['Date'].to_numpy(), index=rows.index[first])
+        in_order = carried_date < rows.loc[first, 'Date']
+
+        prev_closing.loc[in_order[in_order].index] = (
+            carried['Closing_Stock'].to_numpy()[in_order.to_numpy()]
+        )
+        prev_date.loc[in_order[in_order].index] = carried_date[in_order]
+
+    rows['continuity_delta'] = rows['Opening_Stock'] - prev_closing
+    rows['missing_days'] = (
+        ((rows['Date'] - prev_date).dt.days - 1)
+        .clip(lower=0)
+        .fillna(0)
+        .astype(int)
+    )
+
+    return rows[KEY_COLUMNS + ['Date', 'balance_delta', 'continuity_delta', 'missing_days']]
+
+
+def _summarise(deltas: pd.DataFrame, by: str) -> pd.DataFrame:
+    continuity = deltas['continuity_delta']
+
+    return (
+        deltas.assign(
+            balance_mismatches=deltas['balance_delta'] != 0,
+            balance_abs_delta=deltas['balance_delta'].abs(),
+            continuity_breaks=continuity.notna() & (continuity != 0),
+            continuity_abs_delta=continuity.abs().fillna(0)
+        )
+        .groupby(by)
+        .agg(
+            rows=('balance_delta', 'size'),
+            balance_mismatches=('balance_mismatches', 'sum'),
+            balance_abs_delta=('balance_abs_delta', 'sum'),
+            continuity_breaks=('continuity_breaks', 'sum'),
+            continuity_abs_delta=('continuity_abs_delta', 'sum'),
+            missing_days=('missing_days', 'sum')
+        )
+    )
+
+
+def _finalise(summary: pd.DataFrame, by: str) -> pd.DataFrame:
+    summary = summary.astype(int)
+    summary['mismatch_rate'] = np.where(
+        summary['rows'] > 0,
+        (summary['balance_mismatches'] + summary['continuity_breaks']) / summary['rows'],
+        0
+    )
+    return (
+        summary.sort_values('balance_abs_delta', ascending=False)
+        .reset_index()
+        .rename(columns={'index': by})
+    )
+
+
+def reconcile_inventory(df: pd.DataFrame) -> ReconciliationReport:
+    """
+    Builds per-store and per-SKU mismatch summaries for a cleaned frame.
+    """
+
+    deltas = compute_balance_deltas(df)
+
+    return ReconciliationReport(
+        by_store=_finalise(_summarise(deltas, 'Store'), 'Store'),
+        by_sku=_finalise(_summarise(deltas, 'SKU'), 'SKU')
+    )
+
+
+def reconcile_inventory_csv(path, chunksize: int = 500_000) -> ReconciliationReport:
+    """
+    Streams an ERP export in chunks and builds the same report as
+    reconcile_inventory() with memory bounded by the chunk size plus one
+    carried row per SKU × Store.
+
+    Continuity across chunks assumes the export is in chronological order;
+    out-of-order rows at a chunk boundary are only checked within their
+    own chunk.
+    """
+
+    carry = None
+    by_store = None
+    by_sku = None
+
+    for chunk in pd.read_csv(path, usecols=RECONCILIATION_COLUMNS, chunksize=chunksize):
+        chunk = clean_inventory_df(chunk)
+        deltas = compute_balance_deltas(chunk, previous=carry)
+
+        by_store = _accumulate(by_store, _summarise(deltas, 'Store'))
+        by_sku = _accumulate(by_sku, _summarise(deltas, 'SKU'))
+
+        # Last row per key (deltas are sorted by key then Date)
+        last = (
+            deltas[KEY_COLUMNS + ['Date']]
+            .assign(Closing_Stock=chunk.loc[deltas.index, 'Closing_Stock'])
+            .drop_duplicates(KEY_COLUMNS, keep='last')
+            .set_index(KEY_COLUMNS)
+        )
+        if carry is None:
+            carry = last
+        else:
+            carry = pd.concat([carry, last]).sort_values('Date', kind='stable')
+            carry = carry[~carry.index.duplicated(keep='last')]
+
+    if by_store is None:
+        empty = pd.DataFrame(columns=SUMMARY_COLUMNS)
+        return ReconciliationReport(
+            by_store=_finalise(empty, 'Store'),
+            by_sku=_finalise(empty, 'SKU')
+        )
+
+    return ReconciliationReport(
+        by_store=_finalise(by_store, 'Store'),
+        by_sku=_finalise(by_sku, 'SKU')
+    )
+
+
+def _accumulate(total: pd.DataFrame, part: pd.DataFrame) -> pd.DataFrame:
+    if total is None:
+        return part
+    return total.add(part, fill_value=0)
@@ -0,0 +1,245 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pandas as pd
+
+from logic.scoring import (
+    DEFAULT_SELL_THROUGH_WEIGHT,
+    DEFAULT_STOCK_WEIGHT,
+    aggregate_sku_store,
+    score_aggregates,
+)
+from logic.ranking import (
+    DEFAULT_DEADSTOCK_THRESHOLD,
+    DEFAULT_DISTANCE_WEIGHT,
+    DEFAULT_TRANSFER_WEIGHTS,
+    score_transfers,
+)
+from logic.geography import match_nearby
+
+
+@dataclass(frozen=True)
+class ScenarioParams:
+    """
+    One what-if configuration of the scoring and ranking pipeline.
+
+    Frozen so it can be used as a cache key; exclude_stores is normalised
+    to a sorted tuple by ScenarioParams.build().
+    """
+
+    deadstock_threshold: float = DEFAULT_DEADSTOCK_THRESHOLD
+    stock_weight: float = DEFAULT_STOCK_WEIGHT
+    sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT
+    transfer_weights: tuple = DEFAULT_TRANSFER_WEIGHTS
+    exclude_stores: tuple = ()
+    distance_weight: float = DEFAULT_DISTANCE_WEIGHT
+
+    @classmethod
+    def build(cls, exclude_stores=(), transfer_weights=DEFAULT_TRANSFER_WEIGHTS, **kwargs):
+        return cls(
+            exclude_stores=tuple(sorted(set(exclude_stores or ()))),
+            transfer_weights=tuple(float(w) for w in transfer_weights),
+            **kwargs
+        )
+
+
+@dataclass
+class ScenarioResult:
+    params: ScenarioParams
+    scores: pd.DataFrame
+    recommendations: pd.DataFrame
+
+
+class ScenarioEngine:
+    """
+    Evaluates what-if scenarios against one cleaned dataset without
+    rerunning the whole pipeline.
+
+    The SKU–Store aggregation and the source → destination SKU join are
+    computed once. Each scenario then only:
+    - rescores the cached aggregates with its deadstock weights
+    - masks the cached candidate pairs by threshold and excluded stores
+    - recomputes the transfer score over the surviving pairs
+
+    The last `max_scenarios` results are kept in an LRU cache so switching
+    back to an earlier scenario is instant. One engine may be shared by
+    dashboard sessions and API threads, so the caches are guarded by a lock.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        max_scenarios: int = 8,
+        aggregated: bool = False,
+        demand_column: str = 'avg_daily_sales',
+        store_distances: pd.DataFrame = None
+    ):
+        """
+        Parameters:
+            df (pd.DataFrame): Cleaned daily ERP data, or the output of
+                aggregate_sku_store() when aggregated=True
+            max_scenarios (int): Number of scenario results to keep
+            demand_column (str): Destination demand measure; use
+                'forecast_daily_sales' to rank by forecast velocity
+            store_distances (pd.DataFrame, optional): Output of
+                logic.geography.build_distance_matrix(); prunes candidate
+                destinations to the nearest same-region stores (stores
+                missing from it keep every same-SKU destination)
+        """
+        self.agg = df if aggregated else aggregate_sku_store(df)
+        self.demand_column = demand_column
+
+        if demand_column == 'forecast_daily_sales' and demand_column not in self.agg.columns:
+            if aggregated:
+                raise ValueError("Aggregates have no forecast_daily_sales column")
+            from logic.forecasting import add_demand_forecast
+            self.agg = add_demand_forecast(self.agg, df)
+
+        self.max_scenarios = max_scenarios
+        self._results = OrderedDict()
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self._pairs = self._build_candidate_pairs(self.agg, demand_column, store_distances)
+
+    # ---------------------------------------------------------
+    # Cached stages
+    # ---------------------------------------------------------
+    @staticmethod
+    def _build_candidate_pairs(
+        agg: pd.DataFrame,
+        demand_column: str,
+        store_distances: pd.DataFrame = None
+    ) -> pd.DataFrame:
+        """
+        Joins every potential source (stock > 0) with every potential
+        destination (sales > 0) of the same SKU, independent of scores.
+
+        Row positions into `agg` are kept so scenario scores can be
+        gathered with a NumPy take instead of another merge.
+        """
+        positions = pd.RangeIndex(len(agg))
+        base = agg[['SKU', 'Store', 'current_stock', demand_column]].assign(pos=positions)
+
+        source = base[base['current_stock'] > 0].rename(columns={'Store': 'store_from'})
+        dest = base[base[demand_column] > 0].rename(columns={'Store': 'store_to'})
+
+        columns = [
+            'SKU',
+            'store_from',
+            'store_to',
+            'current_stock_source',
+            f'{demand_column}_dest',
+            'pos_source'
+        ]
+
+        if store_distances is not None:
+            pairs = match_nearby(source, dest, store_distances)
+            columns.append('distance_km')
+        else:
+            pairs = pd.merge(source, dest, on='SKU', suffixes=('_source', '_dest'))
+
+        pairs = pairs[pairs['store_from'] != pairs['store_to']]
+
+        return pairs[columns].reset_index(drop=True)
+
+    def _scored(self, stock_weight: float, sell_through_weight: float) -> pd.DataFrame:
+        key = (stock_weight, sell_through_weight)
+        with self._lock:
+            scores = self._scores.get(key)
+            if scores is not None:
+                self._scores.move_to_end(key)
+                return scores
+
+        # Computed outside the lock; a concurrent miss just scores twice
+        scores = score_aggregates(
+            self.agg,
+            stock_weight=stock_weight,
+            sell_through_weight=sell_through_weight
+        )
+        with self._lock:
+            self._scores[key] = scores
+            # Only a handful of weight combinations are live at once
+            while len(self._scores) > self.max_scenarios:
+                self._scores.popitem(last=False)
+        return scores
+
+    # ---------------------------------------------------------
+    # Public API
+    # ---------------------------------------------------------
+    def run(self, params: ScenarioParams = None, **overrides) -> ScenarioResult:
+        """
+        Evaluates a scenario, returning a cached result when available.
+
+        Either pass a ScenarioParams or keyword overrides of its fields,
+        e.g. engine.run(deadstock_threshold=0.5, exclude_stores=['Store 3']).
+        """
+        if params is None:
+            params = ScenarioParams.build(**overrides)
+
+        with self._lock:
+            result = self._results.get(params)
+            if result is not None:
+                self._results.move_to_end(params)
+                return result
+
+        scores = self._scored(params.stock_weight, params.sell_through_weight)
+        recs = self._rank(scores, params)
+
+        result = ScenarioResult(params=params, scores=scores, recommendations=recs)
+        with self._lock:
+            self._results[params] = result
+            while len(self._results) > self.max_scenarios:
+                self._results.popitem(last=False)
+
+        return result
+
+    def _rank(self, scores: pd.DataFrame, params: ScenarioParams) -> pd.DataFrame:
+        pairs = self._pairs
+        source_score = (
+            scores['deadstock_score'].to_numpy(dtype=float)
+            .take(pairs['pos_source'].to_numpy())
+        )
+
+        mask = source_score >= params.deadstock_threshold
+        if params.exclude_stores:
+            excluded = list(params.exclude_stores)
+            mask &= ~pairs['store_from'].isin(excluded).to_numpy()
+            mask &= ~pairs['store_to'].isin(excluded).to_numpy()
+
+        recs = pairs.loc[mask, pairs.columns.drop('pos_source')].assign(
+            deadstock_score_source=source_score[mask]
+        )
+
+        return score_transfers(
+            recs,
+            params.transfer_weights,
+            self.demand_column,
+            params.distance_weight
+        )
+
+    def compare(self, *params: ScenarioParams) -> pd.DataFrame:
+        """
+        Summarises several scenarios side by side (recommendation count,
+        distinct SKUs and mean transfer score).
+        """
+        rows = []
+        for p in params:
+            recs = self.run(p).recommendations
+            rows.append({
+                'deadstock_threshold': p.deadstock_threshold,
+                'stock_weight': p.stock_weight,
+                'sell_through_weight': p.sell_through_weight,
+                'transfer_weights': p.transfer_weights,
+                'exclude_stores': ', '.join(p.exclude_stores),
+                'recommendations': len(recs),
+                'skus': recs['SKU'].nunique(),
+                'mean_transfer_score': recs['transfer_score'].mean() if len(recs) else 0.0
+            })
+        return pd.DataFrame(rows)
+
+    @property
+    def cached_scenarios(self) -> list:
+        """Cached scenario parameters, least recently used first."""
+        with self._lock:
+            return list(self._results)
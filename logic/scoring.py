@@ -2,12 +2,17 @@ import pandas as pd
 import numpy as np
 
 
-def compute_deadstock_score(df: pd.DataFrame) -> pd.DataFrame:
+DEFAULT_STOCK_WEIGHT = 0.6
+DEFAULT_SELL_THROUGH_WEIGHT = 0.4
+
+
+def aggregate_sku_store(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Computes a deadstock score per SKU per Store based on
-    inventory levels and sales velocity.
+    Aggregates cleaned daily ERP data to one row per SKU per Store with
+    total sales, average daily sales, current stock and sell-through.
 
-    Expects cleaned daily ERP data.
+    This is the expensive part of scoring; the result can be cached and
+    rescored with different weights via score_aggregates().
     """
 
     # Required columns from preprocessing
@@ -36,19 +41,49 @@ def compute_deadstock_score(df: pd.DataFrame) -> pd.DataFrame:
     # ---------------------------------------------------------
     # 2️⃣ Compute sell-through proxy
     # ---------------------------------------------------------
+    return add_sell_through_rate(agg)
+
+
+def add_sell_through_rate(agg: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the sell-through proxy (total sales / current stock) in place.
+    Shared with incremental aggregation (logic.watcher).
+    """
     agg['sell_through_rate'] = np.where(
         agg['current_stock'] > 0,
         agg['total_sales'] / agg['current_stock'],
         0
     )
 
+    return agg
+
+
+def score_aggregates(
+    agg: pd.DataFrame,
+    stock_weight: float = DEFAULT_STOCK_WEIGHT,
+    sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT
+) -> pd.DataFrame:
+    """
+    Adds a normalized deadstock_score to the output of aggregate_sku_store().
+
+    Parameters:
+        agg (pd.DataFrame): SKU–Store aggregates
+        stock_weight (float): Weight of the relative stock level
+        sell_through_weight (float): Weight of the (inverted) sell-through
+
+    Returns:
+        pd.DataFrame: Copy of agg with a deadstock_score column
+    """
+
+    agg = agg.copy()
+
     # ---------------------------------------------------------
     # 3️⃣ Deadstock score (normalized 0–1)
     # High stock + low sales velocity = higher risk
     # ---------------------------------------------------------
     raw_score = (
-        (agg['current_stock'] / agg['current_stock'].max()) * 0.6 +
-        (1 - agg['sell_through_rate'].clip(0, 1)) * 0.4
+        (agg['current_stock'] / agg['current_stock'].max()) * stock_weight +
+        (1 - agg['sell_through_rate'].clip(0, 1)) * sell_through_weight
     )
 
     agg['deadstock_score'] = (
@@ -59,3 +94,22 @@ def compute_deadstock_score(df: pd.DataFrame) -> pd.DataFrame:
     )
 
     return agg
+
+
+def compute_deadstock_score(
+    df: pd.DataFrame,
+    stock_weight: float = DEFAULT_STOCK_WEIGHT,
+    sell_through_weight: float = DEFAULT_SELL_THROUGH_WEIGHT
+) -> pd.DataFrame:
+    """
+    Computes a deadstock score per SKU per Store based on
+    inventory levels and sales velocity.
+
+    Expects cleaned daily ERP data.
+    """
+
+    return score_aggregates(
+        aggregate_sku_store(df),
+        stock_weight=stock_weight,
+        sell_through_weight=sell_through_weight
+    )
@@ -0,0 +1,345 @@
+"""
+Mergeable sketches for approximate network-wide KPIs.
+
+    HyperLogLog   distinct counts (e.g. SKUs across all stores)
+    KLLSketch     quantiles and histograms (e.g. median / distribution of
+                  current stock)
+
+Sketches are built per partition (one row per Store in the
+`kpi_sketches` table the loaders publish) and merged on read, so headline
+KPIs cost a merge of a few kilobytes per store instead of a pass over
+every SKU–Store row. Sums, counts and means stay exact: they merge
+without any sketch. Every approximate figure comes with its error bound.
+"""
+
+import struct
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_HLL_PRECISION = 12      # 4096 registers, ~1.6% standard error
+DEFAULT_KLL_K = 200             # ~1.3% rank error
+
+SKETCH_COLUMNS = ['Store', 'rows', 'stock_sum', 'sell_through_sum', 'sku_hll', 'stock_kll']
+
+
+def _hash(values) -> np.ndarray:
+    return pd.util.hash_pandas_object(pd.Series(values).astype(str), index=False).to_numpy()
+
+
+def _partition_seed(keys) -> int:
+    """
+    Stable RNG seed for the partitions identified by `keys` (e.g. Store
+    names), so compaction coin flips repeat for the same partitions.
+    """
+    return int(_hash(['|'.join(sorted(map(str, keys)))])[0])
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Exact bit length of unsigned 64-bit integers, vectorised."""
+    x = x.copy()
+    n = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= (np.uint64(1) << np.uint64(shift))
+        n[big] += shift
+        x[big] >>= np.uint64(shift)
+    return n + (x > 0)
+
+
+# ---------------------------------------------------------
+# 1️⃣ HyperLogLog
+# ---------------------------------------------------------
+class HyperLogLog:
+    """
+    Distinct-count sketch with 2**p one-byte registers. Merging is an
+    element-wise max, so partitions can be combined in any order.
+    """
+
+    def __init__(self, p: int = DEFAULT_HLL_PRECISION, registers: np.ndarray = None):
+        if not 4 <= p <= 18:
+            raise ValueError("HyperLogLog precision must be between 4 and 18")
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8) if registers is None else registers
+
+    def update(self, values) -> "HyperLogLog":
+        hashes = _hash(values)
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        # Position of the leftmost 1-bit in the remaining 64 - p bits
+        rank = (64 - self.p) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        return HyperLogLog(self.p, np.maximum(self.registers, other.registers))
+
+    @property
+    def relative_error(self) -> float:
+        """Standard error of estimate() relative to the true count."""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return m * np.log(m / zeros)
+        return float(raw)
+
+    def to_bytes(self) -> bytes:
+        return struct.pack('<B', self.p) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        p = data[0]
+        return cls(p, np.frombuffer(data, dtype=np.uint8, offset=1).copy())
+
+
+# ---------------------------------------------------------
+# 2️⃣ KLL quantile sketch
+# ---------------------------------------------------------
+class KLLSketch:
+    """
+    Quantile sketch (Karnin, Lang & Liberty). Level h holds items of weight
+    2**h; when a level outgrows its capacity it is sorted and every other
+    item is promoted, so memory stays O(k) while rank error stays about
+    rank_error regardless of how many values or merges went in.
+    """
+
+    def __init__(self, k: int = DEFAULT_KLL_K, seed: int = None):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd item out stays behind at this level
+                keep, items = items[:len(items) % 2], items[len(items) % 2:]
+                promoted = items[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # New top level shrinks every capacity below it
+                level = 0
+                continue
+            level += 1
+
+    def update(self, values) -> "KLLSketch":
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch", seed: int = None) -> "KLLSketch":
+        merged = KLLSketch(self.k, seed)
+        merged.n = self.n + other.n
+        depth = max(len(self.levels), len(other.levels))
+        merged.levels = [
+            np.concatenate([
+                self.levels[h] if h < len(self.levels) else np.empty(0),
+                other.levels[h] if h < len(other.levels) else np.empty(0)
+            ])
+            for h in range(depth)
+        ]
+        merged._compress()
+        return merged
+
+    @classmethod
+    def merge_all(cls, sketches: list, k: int = DEFAULT_KLL_K, seed: int = None) -> "KLLSketch":
+        """
+        Merges many sketches with a single compaction pass; pass a seed
+        (see _partition_seed()) for reproducible results.
+        """
+        merged = cls(k, seed)
+        depth = max((len(s.levels) for s in sketches), default=1)
+        merged.n = sum(s.n for s in sketches)
+        merged.levels = [
+            np.concatenate([s.levels[h] for s in sketches if h < len(s.levels)] or [np.empty(0)])
+            for h in range(depth)
+        ]
+        merged._compress()
+        return merged
+
+    @property
+    def rank_error(self) -> float:
+        """
+        Normalised rank error of a single quantile query at ~99%
+        confidence (empirical KLL bound 2.296 / k**0.9723).
+        """
+        return 2.296 / self.k ** 0.9723
+
+    def _weighted(self) -> tuple:
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2 ** h) for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        """Approximate value at quantile(s) q in [0, 1]."""
+        items, weights = self._weighted()
+        if not len(items):
+            return np.nan
+        cumulative = np.cumsum(weights)
+        target = np.asarray(q, dtype=float) * cumulative[-1]
+        index = np.searchsorted(cumulative, target, side='left').clip(max=len(items) - 1)
+        return items[index]
+
+    def histogram(self, bins: int = 30, value_range: tuple = None) -> tuple:
+        """
+        Approximate counts per bin, scaled to the number of values seen.
+
+        Returns:
+            tuple: (counts, bin edges) as in np.histogram
+        """
+        items, weights = self._weighted()
+        return np.histogram(items, bins=bins, range=value_range, weights=weights)
+
+    def to_bytes(self) -> bytes:
+        sizes = [len(level) for level in self.levels]
+        header = struct.pack(f'<IQI{len(sizes)}I', self.k, self.n, len(sizes), *sizes)
+        return header + np.concatenate(self.levels).astype(np.float64).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KLLSketch":
+        k, n, depth = struct.unpack_from('<IQI', data)
+        sizes = struct.unpack_from(f'<{depth}I', data, 16)
+        values = np.frombuffer(data, dtype=np.float64, offset=16 + 4 * depth)
+        sketch = cls(k)
+        sketch.n = n
+        sketch.levels = list(np.split(values.copy(), np.cumsum(sizes)[:-1]))
+        return sketch
+
+
+# ---------------------------------------------------------
+# 3️⃣ Partition sketches for scores
+# ---------------------------------------------------------
+def build_partition_sketches(
+    scores: pd.DataFrame,
+    stores=None,
+    previous: pd.DataFrame = None,
+    p: int = DEFAULT_HLL_PRECISION,
+    k: int = DEFAULT_KLL_K
+) -> pd.DataFrame:
+    """
+    One sketch row per Store from the output of compute_deadstock_score().
+
+    Parameters:
+        scores (pd.DataFrame): SKU–Store scores
+        stores (iterable, optional): Only rebuild these stores and reuse
+            the rest from `previous` (incremental ingest)
+        previous (pd.DataFrame, optional): Earlier output of this function
+
+    Returns:
+        pd.DataFrame: Store, rows, stock_sum, sell_through_sum, sku_hll,
+        stock_kll
+    """
+
+    required_columns = {'SKU', 'Store', 'current_stock', 'sell_through_rate'}
+    if not required_columns.issubset(scores.columns):
+        raise ValueError(f"Missing required columns: {required_columns}")
+
+    if stores is not None and previous is not None:
+        stores = set(stores)
+        subset = scores[scores['Store'].isin(stores)]
+        kept = previous[~previous['Store'].isin(stores) & previous['Store'].isin(scores['Store'])]
+    else:
+        subset, kept = scores, None
+
+    rows = []
+    for store, group in subset.groupby('Store', sort=True):
+        rows.append({
+            'Store': store,
+            'rows': len(group),
+            'stock_sum': float(group['current_stock'].sum()),
+            'sell_through_sum': float(group['sell_through_rate'].sum()),
+            'sku_hll': HyperLogLog(p).update(group['SKU']).to_bytes(),
+            'stock_kll': KLLSketch(k, _partition_seed([store])).update(group['current_stock']).to_bytes()
+        })
+
+    built = pd.DataFrame(rows, columns=SKETCH_COLUMNS)
+    if kept is None:
+        return built
+    if not rows:
+        return kept.reset_index(drop=True)
+    return pd.concat([kept, built], ignore_index=True).sort_values('Store', ignore_index=True)
+
+
+def approximate_kpis(sketches: pd.DataFrame, bins: int = 30) -> dict:
+    """
+    Network-wide KPIs from merged partition sketches.
+
+    Returns:
+        dict: total_skus, median_stock, total_stock, stores, records,
+        avg_sell_through, stock_histogram (counts, edges), store_ranking,
+        and the error bounds of the approximate figures
+    """
+
+    if sketches.empty:
+        raise ValueError("No sketches to merge")
+
+    hll = HyperLogLog.from_bytes(sketches['sku_hll'].iloc[0])
+    for data in sketches['sku_hll'].iloc[1:]:
+        hll = hll.merge(HyperLogLog.from_bytes(data))
+
+    kll = KLLSketch.merge_all(
+        [KLLSketch.from_bytes(data) for data in sketches['stock_kll']],
+        seed=_partition_seed(sketches['Store'])
+    )
+    rows = int(sketches['rows'].sum())
+
+    return {
+        'total_skus': hll.estimate(),
+        'median_stock': float(kll.quantile(0.5)),
+        'total_stock': float(sketches['stock_sum'].sum()),
+        'stores': len(sketches),
+        'records': rows,
+        'avg_sell_through': float(sketches['sell_through_sum'].sum() / rows) if rows else np.nan,
+        'stock_histogram': kll.histogram(bins),
+        'store_ranking': (
+            sketches.assign(Sell_Through=sketches['sell_through_sum'] / sketches['rows'])
+            [['Store', 'Sell_Through']]
+            .sort_values('Sell_Through', ascending=False, ignore_index=True)
+        ),
+        'error': {
+            'total_skus_relative': hll.relative_error,
+            'median_stock_rank': kll.rank_error
+        }
+    }
+
+
+def exact_kpis(scores: pd.DataFrame, bins: int = 30) -> dict:
+    """The same KPIs as approximate_kpis(), computed exactly."""
+    return {
+        'total_skus': scores['SKU'].nunique(),
+        'median_stock': float(scores['current_stock'].median()),
+        'total_stock': float(scores['current_stock'].sum()),
+        'stores': scores['Store'].nunique(),
+        'records': len(scores),
+        'avg_sell_through': float(scores['sell_through_rate'].mean()),
+        'stock_histogram': np.histogram(scores['current_stock'], bins=bins),
+        'store_ranking': (
+            scores.groupby('Store')['sell_through_rate'].mean()
+            .rename('Sell_Through')
+            .reset_index()
+            .sort_values('Sell_Through', ascending=False, ignore_index=True)
+        ),
+        'error': {'total_skus_relative': 0.0, 'median_stock_rank': 0.0}
+    }
@@ -0,0 +1,261 @@
+"""
+Shared, memory-mapped dataset snapshots.
+
+A loader process runs the pipeline once and writes its frames as
+uncompressed Arrow IPC (Feather v2) files. The dashboard and every API
+worker memory-map those files read-only, so all processes share one copy
+of the data through the OS page cache instead of each holding its own.
+
+Layout:
+    <root>/versions/<version>/<table>.arrow
+    <root>/versions/<version>/manifest.json
+    <root>/CURRENT                      -> name of the live version
+    <root>/history/                     -> scores/recommendations of every
+                                           version ever published (logic.history)
+
+A version directory is fully written before CURRENT is swapped with an
+atomic rename, so readers never observe a half-written snapshot.
+
+Usage:
+    python -m logic.snapshot <data.csv> <snapshot_dir> [store_locations.csv] [--backend duckdb]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+MANIFEST_FILE = "manifest.json"
+HISTORY_DIR = "history"
+
+STAGING_PREFIX = ".staging-"
+
+# Staging directories older than this were left by a crashed loader
+STALE_STAGING_SECONDS = 3600
+
+
+def _arrow():
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    return pa, feather
+
+
+def _new_version() -> str:
+    # Sortable by time, unique across concurrent loaders
+    return f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def write_snapshot(root, frames: dict, metadata: dict = None, keep: int = 3, history: bool = True) -> str:
+    """
+    Writes a new snapshot version and atomically makes it current.
+
+    Parameters:
+        root (str | Path): Snapshot directory
+        frames (dict): Table name -> DataFrame
+        metadata (dict, optional): Extra JSON-serialisable manifest fields
+        keep (int): Number of versions to retain (older ones are removed)
+        history (bool): Also append scores and recommendations to the
+            permanent version history under <root>/history
+
+    Returns:
+        str: The new version id
+    """
+
+    pa, feather = _arrow()
+    root = Path(root)
+    versions = root / VERSIONS_DIR
+    versions.mkdir(parents=True, exist_ok=True)
+
+    _remove_stale_staging(versions)
+
+    version = _new_version()
+    staging = versions / f"{STAGING_PREFIX}{version}"
+    staging.mkdir()
+
+    try:
+        tables = {}
+        for name, df in frames.items():
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # Uncompressed so readers can memory-map buffers without decoding
+            feather.write_feather(table, staging / f"{name}.arrow", compression="uncompressed")
+            tables[name] = {"rows": table.num_rows, "columns": table.column_names}
+
+        manifest = {"version": version, "created": time.time(), "tables": tables, **(metadata or {})}
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+        os.rename(staging, versions / version)
+    finally:
+        # Only left behind when the rename did not happen
+        shutil.rmtree(staging, ignore_errors=True)
+
+    pointer = root / f".{CURRENT_FILE}.{version}"
+    pointer.write_text(version)
+    os.replace(pointer, root / CURRENT_FILE)
+
+    _prune(versions, keep)
+
+    if history:
+        from logic.history import record_history
+        record_history(root / HISTORY_DIR, version, frames, metadata)
+
+    return version
+
+
+def _remove_stale_staging(versions: Path) -> None:
+    """
+    Removes staging directories a killed loader never renamed. Recent ones
+    may belong to a concurrent loader and are left alone.
+    """
+    cutoff = time.time() - STALE_STAGING_SECONDS
+    for staging in versions.glob(f"{STAGING_PREFIX}*"):
+        try:
+            if staging.stat().st_mtime < cutoff:
+                shutil.rmtree(staging, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def _prune(versions: Path, keep: int) -> None:
+    """
+    Removes old versions. Readers that still map a removed version keep
+    working on POSIX, since unlinked files stay alive while mapped.
+    """
+    existing = sorted(
+        (p for p in versions.iterdir() if p.is_dir() and not p.name.startswith(".")),
+        key=lambda p: p.stat().st_mtime_ns
+    )
+    for old in existing[:-keep] if keep > 0 else []:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def current_version(root) -> str | None:
+    """Returns the live version id, or None when no snapshot exists."""
+    try:
+        return (Path(root) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_manifest(root, version: str = None) -> dict:
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot found in {root}")
+    return json.loads((Path(root) / VERSIONS_DIR / version / MANIFEST_FILE).read_text())
+
+
+def read_table(root, name: str, version: str = None, columns: list = None) -> pd.DataFrame:
+    """
+    Memory-maps one table of a snapshot and returns it as a DataFrame.
+
+    Numeric columns are zero-copy views of the mapped file and string
+    columns stay Arrow-backed, so the data lives in the shared page cache
+    rather than in each process's heap.
+    """
+
+    pa, _ = _arrow()
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No snapshot found in {root}")
+
+    path = Path(root) / VERSIONS_DIR / version / f"{name}.arrow"
+    source = pa.memory_map(str(path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+
+    string_dtype = pd.StringDtype("pyarrow")
+    return table.to_pandas(
+        split_blocks=True,
+        types_mapper={pa.string(): string_dtype, pa.large_string(): string_dtype}.get
+    )
+
+
+class SnapshotReader:
+    """
+    Per-process handle on a snapshot directory.
+
+    Tables are mapped on first access and remapped automatically after the
+    loader publishes a new version; checking for a new version is a single
+    small file read.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.version = None
+        self._tables = {}
+
+    def refresh(self) -> bool:
+        """Switches to the current version; returns True if it changed."""
+        version = current_version(self.root)
+        if version != self.version:
+            self.version = version
+            self._tables = {}
+            return True
+        return False
+
+    def has_table(self, name: str) -> bool:
+        self.refresh()
+        return self.version is not None and name in read_manifest(self.root, self.version)["tables"]
+
+    def table(self, name: str) -> pd.DataFrame:
+        self.refresh()
+        if self.version is None:
+            raise FileNotFoundError(f"No snapshot found in {self.root}")
+        if name not in self._tables:
+            self._tables[name] = read_table(self.root, name, self.version)
+        return self._tables[name]
+
+
+def build_snapshot(data_path, root, keep: int = 3, locations_path=None, backend: str = "pandas") -> str:
+    """
+    Runs load → score → forecast → rank on an ERP export and publishes the
+    cleaned inventory, scores, recommendations and per-store KPI sketches
+    (logic.sketches) as a new snapshot version.
+    With a store-locations file the store distance matrix is published too
+    and recommendations are geography-aware. Scoring and ranking run on the
+    given execution backend (see logic.backends).
+    """
+
+    from logic.preprocessing import load_inventory
+    from logic.backends import run_pipeline
+    from logic.forecasting import add_demand_forecast
+    from logic.geography import load_store_distances
+    from logic.sketches import build_partition_sketches
+
+    inventory = load_inventory(str(data_path))
+    distances = load_store_distances(locations_path, inventory)
+    scores, recs = run_pipeline(inventory, backend, store_distances=distances)
+    scores = add_demand_forecast(scores, inventory)
+
+    frames = {
+        "inventory": inventory,
+        "scores": scores,
+        "recommendations": recs,
+        "kpi_sketches": build_partition_sketches(scores)
+    }
+    if distances is not None:
+        frames["store_distances"] = distances
+
+    return write_snapshot(root, frames, metadata={"source": str(data_path)}, keep=keep)
+
+
+if __name__ == "__main__":
+    from logic.backends import BACKENDS
+
+    parser = argparse.ArgumentParser(prog="python -m logic.snapshot")
+    parser.add_argument("data_path")
+    parser.add_argument("snapshot_dir")
+    parser.add_argument("locations_path", nargs="?")
+    parser.add_argument("--backend", choices=BACKENDS, default="pandas")
+    args = parser.parse_args()
+
+    print(build_snapshot(args.data_path, args.snapshot_dir, locations_path=args.locations_path, backend=args.backend))
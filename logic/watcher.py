@@ -0,0 +1,461 @@
+"""
+Watched data directory with incremental refresh.
+
+A long-running loader polls a directory of ERP exports. When files are
+added or rows are appended, only the new rows go through validation and
+cleaning; the SKU–Store aggregates are updated in place, the demand
+forecast's smoothing state is advanced over the new days only, scores and
+recommendations are recomputed from the aggregates, and a new snapshot
+version is published (see logic.snapshot). The dashboard and API workers
+pick the new version up on their next request.
+
+The dataset is the concatenation of every export in file-name order, so
+nightly drops named by date append naturally. Anything that is not an
+append — a rewritten, truncated or removed file, or a new file sorting
+before already-ingested ones — falls back to a full rebuild, so results
+always equal a fresh load of the directory.
+
+Usage:
+    python -m logic.watcher <data_dir> <snapshot_dir> [--locations store_locations.csv]
+"""
+
+import argparse
+import io
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from logic.data_validation import validate_inventory_df
+from logic.data_cleaning import clean_inventory_df
+from logic.scoring import add_sell_through_rate, score_aggregates
+from logic.ranking import get_redistribution_recommendations
+from logic.forecasting import SEASON_LENGTH, advance_forecast, fit_forecast
+from logic.geography import load_store_distances
+from logic.sketches import build_partition_sketches
+from logic.snapshot import write_snapshot
+
+
+DEFAULT_PATTERNS = ('*.csv', '*.parquet')
+
+DEFAULT_INTERVAL = 2.0
+
+# Bytes before the last ingested offset that must be unchanged for a CSV
+# change to count as an append
+TAIL_BYTES = 256
+
+KEY_COLUMNS = ['Date', 'Store', 'SKU']
+
+
+@dataclass
+class FileCursor:
+    """How much of one export has been ingested."""
+    size: int
+    mtime_ns: int
+    offset: int
+    header: bytes = b''
+    tail: bytes = b''
+
+
+def _is_parquet(path: Path) -> bool:
+    return path.suffix.lower() in ('.parquet', '.pq')
+
+
+def read_new_rows(path: Path, cursor: FileCursor = None) -> tuple:
+    """
+    Reads rows added to an export since `cursor`.
+
+    CSV files are read from the cursor's byte offset up to the last
+    complete line, so a file still being written is picked up line by
+    line. Parquet files are immutable and always read whole.
+
+    Returns:
+        tuple: (raw DataFrame, new FileCursor)
+    """
+
+    stat = path.stat()
+
+    if _is_parquet(path):
+        return pd.read_parquet(path), FileCursor(stat.st_size, stat.st_mtime_ns, stat.st_size)
+
+    with open(path, 'rb') as f:
+        if cursor is None:
+            header = f.readline()
+            start = f.tell()
+        else:
+            header, start = cursor.header, cursor.offset
+            f.seek(start)
+        body = f.read()
+
+    # Leave a trailing partial line for the next poll
+    body = body[:body.rfind(b'\n') + 1]
+    offset = start + len(body)
+
+    with open(path, 'rb') as f:
+        f.seek(max(offset - TAIL_BYTES, 0))
+        tail = f.read(offset - max(offset - TAIL_BYTES, 0))
+
+    df = pd.read_csv(io.BytesIO(header + body))
+    return df, FileCursor(stat.st_size, stat.st_mtime_ns, offset, header, tail)
+
+
+def _is_append(path: Path, cursor: FileCursor) -> bool:
+    """True if the file only grew since the cursor was taken."""
+    if _is_parquet(path) or path.stat().st_size < cursor.offset:
+        return False
+
+    with open(path, 'rb') as f:
+        if f.read(len(cursor.header)) != cursor.header:
+            return False
+        f.seek(cursor.offset - len(cursor.tail))
+        return f.read(len(cursor.tail)) == cursor.tail
+
+
+def _row_keys(df: pd.DataFrame) -> np.ndarray:
+    """
+    64-bit hashes of the Date + Store + SKU uniqueness key, the same key
+    validate_inventory_df() checks.
+
+    Keys are standardised the way clean_inventory_df() does first, so a
+    Parquet datetime and a CSV date string (or "store a" and "Store A")
+    hash the same across exports.
+    """
+    keys = pd.DataFrame({
+        'Date': pd.to_datetime(df['Date'], errors='raise').dt.as_unit('ns'),
+        'Store': df['Store'].astype(str).str.strip().str.title(),
+        'SKU': df['SKU'].astype(str).str.strip().str.upper()
+    })
+    return pd.util.hash_pandas_object(keys[KEY_COLUMNS], index=False).to_numpy()
+
+
+def _aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mergeable SKU–Store aggregates: sums and counts add up across batches
+    and the latest batch holds the last closing stock.
+    """
+    return df.groupby(['SKU', 'Store'], as_index=False).agg(
+        total_sales=('Sales', 'sum'),
+        n_days=('Sales', 'count'),
+        current_stock=('Closing_Stock', 'last')
+    )
+
+
+class IncrementalDataset:
+    """
+    Cleaned inventory, mergeable aggregates and per-file cursors for one
+    watched directory.
+
+    Parameters:
+        data_dir (str | Path): Directory of ERP exports
+        patterns (tuple): Glob patterns of export files
+        locations_path (str | Path, optional): Store locations file for
+            geography-aware recommendations
+    """
+
+    def __init__(self, data_dir, patterns: tuple = DEFAULT_PATTERNS, locations_path=None):
+        self.data_dir = Path(data_dir)
+        self.patterns = patterns
+        self.locations_path = Path(locations_path) if locations_path else None
+
+        self.inventory = None
+        self.state = None
+        self.cursors = {}
+        self.store_distances = None
+        self.forecast = None
+        self.sketches = None
+        self._keys = np.empty(0, dtype=np.uint64)
+        # Stores whose KPI sketches need rebuilding; None means all
+        self._dirty_stores = None
+        self._forecast_state = None
+        self._locations_mtime = None
+
+    # ---------------------------------------------------------
+    # 1️⃣ Change detection
+    # ---------------------------------------------------------
+    def list_files(self) -> list:
+        files = set()
+        for pattern in self.patterns:
+            files.update(p for p in self.data_dir.glob(pattern) if p.is_file())
+        if self.locations_path is not None:
+            files.discard(self.locations_path)
+        return sorted(files, key=lambda p: p.name)
+
+    def changed_files(self) -> tuple:
+        """
+        Returns (changed files in name order, True if only appends).
+        """
+
+        files = self.list_files()
+        changed = []
+        for path in files:
+            cursor = self.cursors.get(path)
+            stat = path.stat()
+            if cursor is None or (stat.st_size, stat.st_mtime_ns) != (cursor.size, cursor.mtime_ns):
+                changed.append(path)
+
+        removed = set(self.cursors) - set(files)
+        if removed or self.inventory is None:
+            return changed, False
+
+        appendable = all(path not in self.cursors or _is_append(path, self.cursors[path]) for path in changed)
+
+        # New rows must land at the end of the concatenated dataset: only
+        # the newest known file may grow, and new files must sort after it
+        newest = max(self.cursors, key=lambda p: p.name) if self.cursors else None
+        in_order = all(
+            path == newest if path in self.cursors else newest is None or path.name > newest.name
+            for path in changed
+        )
+
+        return changed, appendable and in_order
+
+    # ---------------------------------------------------------
+    # 2️⃣ Ingestion
+    # ---------------------------------------------------------
+    def rebuild(self) -> int:
+        """Reloads every export from scratch; returns the row count."""
+
+        frames, cursors = [], {}
+        for path in self.list_files():
+            df, cursors[path] = read_new_rows(path)
+            frames.append(df)
+
+        if not frames:
+            raise FileNotFoundError(f"No ERP exports matching {self.patterns} in {self.data_dir}")
+
+        raw = pd.concat(frames, ignore_index=True)
+        validate_inventory_df(raw)
+        self._keys = np.sort(_row_keys(raw))
+        self.inventory = clean_inventory_df(raw)
+        self.state = _aggregate(self.inventory)
+        self.cursors = cursors
+        self.forecast = None
+        self._forecast_state = None
+        self._dirty_stores = None
+        return len(self.inventory)
+
+    def ingest(self, paths: list) -> pd.DataFrame:
+        """
+        Validates, cleans and merges the rows appended to `paths`.
+
+        Returns:
+            pd.DataFrame: The cleaned new rows
+
+        Raises:
+            ValueError: If the new rows fail validation or duplicate rows
+                already ingested; nothing is merged in that case.
+        """
+
+        frames, cursors = [], {}
+        for path in paths:
+            df, cursors[path] = read_new_rows(path, self.cursors.get(path))
+            frames.append(df)
+
+        raw = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if raw.empty:
+            self.cursors.update(cursors)
+            return raw
+
+        validate_inventory_df(raw)
+
+        # Duplicates against rows already ingested
+        keys = _row_keys(raw)
+        if len(self._keys):
+            positions = np.searchsorted(self._keys, keys).clip(max=len(self._keys) - 1)
+            duplicates = int((self._keys[positions] == keys).sum())
+            if duplicates:
+                raise ValueError(
+                    f"Duplicate records detected for Date + Store + SKU. "
+                    f"Count: {duplicates}"
+                )
+
+        delta = clean_inventory_df(raw)
+        new_stores = not delta['Store'].isin(self.state['Store']).all()
+
+        self.inventory = pd.concat([self.inventory, delta], ignore_index=True)
+        self.state = (
+            pd.concat([self.state, _aggregate(delta)], ignore_index=True)
+            .groupby(['SKU', 'Store'], as_index=False)
+            .agg(total_sales=('total_sales', 'sum'), n_days=('n_days', 'sum'), current_stock=('current_stock', 'last'))
+        )
+        self._keys = np.sort(np.concatenate([self._keys, keys]))
+        self.cursors.update(cursors)
+        self._update_forecast(delta)
+        if self._dirty_stores is not None:
+            self._dirty_stores.update(delta['Store'].unique())
+        if new_stores:
+            self.refresh_locations(force=True)
+        return delta
+
+    # ---------------------------------------------------------
+    # 3️⃣ Derived tables
+    # ---------------------------------------------------------
+    def _update_forecast(self, delta: pd.DataFrame = None) -> None:
+        dates = self.inventory['Date']
+        start, end = dates.min(), dates.max()
+        state = self._forecast_state
+
+        if (
+            delta is None or state is None or start != state.start
+            or (state.end - state.start).days + 1 < SEASON_LENGTH
+        ):
+            state = fit_forecast(self.inventory)
+        else:
+            # Nightly drops: every series' state steps over the new days only
+            late = delta['Date'] <= state.end
+            state = advance_forecast(state, delta[~late], end)
+            if late.any():
+                # Rows inside the smoothed range change those series' history
+                affected = delta.loc[late, ['SKU', 'Store']].drop_duplicates()
+                rows = self.inventory.merge(affected, on=['SKU', 'Store'])
+                state = state.update(fit_forecast(rows, date_range=(start, end)))
+
+        self._forecast_state = state
+        self.forecast = state.forecast()
+
+    def aggregates(self) -> pd.DataFrame:
+        """Same output as aggregate_sku_store() on the full inventory."""
+        agg = self.state.assign(
+            avg_daily_sales=self.state['total_sales'] / self.state['n_days']
+        )[['SKU', 'Store', 'total_sales', 'avg_daily_sales', 'current_stock']]
+        return add_sell_through_rate(agg)
+
+    def refresh_locations(self, force: bool = False) -> bool:
+        """
+        Reloads the distance matrix when the locations file changed, or
+        when forced because stores (and so regions) changed.
+        """
+        if self.locations_path is None:
+            return False
+        mtime = self.locations_path.stat().st_mtime_ns if self.locations_path.exists() else None
+        if mtime == self._locations_mtime and not force:
+            return False
+        self._locations_mtime = mtime
+        self.store_distances = load_store_distances(self.locations_path, self.inventory)
+        return True
+
+    def tables(self) -> dict:
+        """
+        Snapshot frames: inventory, scores, recommendations, kpi_sketches
+        [, store_distances].
+        """
+
+        if self.forecast is None:
+            self._update_forecast()
+
+        scores = score_aggregates(self.aggregates()).merge(
+            self.forecast[['SKU', 'Store', 'forecast_daily_sales']],
+            on=['SKU', 'Store'],
+            how='left'
+        ).fillna({'forecast_daily_sales': 0.0})
+
+        recs = get_redistribution_recommendations(scores, store_distances=self.store_distances)
+
+        # Only stores touched since the last publish are re-sketched
+        self.sketches = build_partition_sketches(scores, stores=self._dirty_stores, previous=self.sketches)
+        self._dirty_stores = set()
+
+        frames = {
+            "inventory": self.inventory,
+            "scores": scores,
+            "recommendations": recs,
+            "kpi_sketches": self.sketches
+        }
+        if self.store_distances is not None:
+            frames["store_distances"] = self.store_distances
+        return frames
+
+    # ---------------------------------------------------------
+    # 4️⃣ Refresh + publish
+    # ---------------------------------------------------------
+    def refresh(self, snapshot_dir, keep: int = 3) -> dict | None:
+        """
+        Ingests whatever changed and publishes a new snapshot version.
+
+        Returns:
+            dict | None: Summary of the refresh, or None if nothing changed
+        """
+
+        start = time.perf_counter()
+        changed, incremental = self.changed_files()
+        removed = set(self.cursors) - set(self.list_files())
+
+        if not changed and not removed and self.inventory is not None:
+            if not self.refresh_locations():
+                return None
+            mode, rows = 'locations', 0
+        elif incremental:
+            rows = len(self.ingest(changed))
+            if rows == 0 and not self.refresh_locations():
+                return None
+            mode = 'incremental'
+        else:
+            rows = self.rebuild()
+            mode = 'full'
+            self.refresh_locations(force=True)
+
+        version = write_snapshot(
+            snapshot_dir,
+            self.tables(),
+            metadata={
+                "source": str(self.data_dir),
+                "files": [p.name for p in self.cursors],
+                "refresh": mode,
+                "rows_added": rows
+            },
+            keep=keep
+        )
+        return {
+            "version": version,
+            "mode": mode,
+            "rows_added": rows,
+            "seconds": time.perf_counter() - start
+        }
+
+
+def watch(
+    data_dir,
+    snapshot_dir,
+    locations_path=None,
+    interval: float = DEFAULT_INTERVAL,
+    patterns: tuple = DEFAULT_PATTERNS,
+    keep: int = 3
+) -> None:
+    """
+    Polls data_dir forever, publishing a snapshot after every change.
+    Invalid drops are reported and skipped; the previous version stays live.
+    """
+
+    dataset = IncrementalDataset(data_dir, patterns, locations_path)
+    last_error = None
+
+    while True:
+        try:
+            summary = dataset.refresh(snapshot_dir, keep=keep)
+            last_error = None
+            if summary:
+                print(
+                    f"Published {summary['version']} ({summary['mode']}, "
+                    f"+{summary['rows_added']:,} rows) in {summary['seconds']:.2f} s",
+                    flush=True
+                )
+        except (ValueError, FileNotFoundError) as e:
+            # Retried every poll until the file is fixed; reported once
+            if str(e) != last_error:
+                print(f"Refresh skipped: {e}", flush=True)
+            last_error = str(e)
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m logic.watcher")
+    parser.add_argument("data_dir")
+    parser.add_argument("snapshot_dir")
+    parser.add_argument("--locations", help="Store locations file (optional)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Polling interval in seconds")
+    parser.add_argument("--keep", type=int, default=3, help="Snapshot versions to retain")
+    args = parser.parse_args()
+
+    watch(args.data_dir, args.snapshot_dir, args.locations, args.interval, keep=args.keep)
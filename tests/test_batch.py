@@ -0,0 +1,50 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from logic.batch import CACHE_DIR, REPORT_FILE, run_batch
+from logic.equivalence import RECOMMENDATION_KEYS, SCORE_KEYS, compare_frames, generate_erp_frame
+
+
+@pytest.fixture
+def export(tmp_path):
+    df = generate_erp_frame(np.random.default_rng(5), n_skus=12, n_stores=5, n_days=20)
+    path = tmp_path / "erp.csv"
+    df.assign(Date=df["Date"].dt.strftime("%Y-%m-%d")).to_csv(path, index=False)
+    return path
+
+
+def test_duckdb_batch_matches_pandas(export, tmp_path):
+    pytest.importorskip("duckdb")
+    params = {"stock_weight": 0.7, "sell_through_weight": 0.3, "transfer_weights": (0.4, 0.4, 0.2)}
+
+    reports = {
+        backend: run_batch(export, tmp_path / backend, backend=backend, **params)
+        for backend in ("pandas", "duckdb")
+    }
+
+    assert reports["duckdb"]["status"] == "succeeded"
+    assert reports["duckdb"]["mismatches"] == reports["pandas"]["mismatches"]
+    for name, keys in (("scores", SCORE_KEYS), ("recommendations", RECOMMENDATION_KEYS)):
+        compare_frames(
+            pd.read_parquet(tmp_path / "pandas" / f"{name}.parquet"),
+            pd.read_parquet(tmp_path / "duckdb" / f"{name}.parquet"),
+            keys
+        )
+
+
+@pytest.mark.parametrize("backend", ["pandas", "duckdb"])
+def test_stage_cache_is_opt_in(export, tmp_path, backend):
+    if backend == "duckdb":
+        pytest.importorskip("duckdb")
+
+    run_batch(export, tmp_path / "plain", backend=backend)
+    assert not (tmp_path / "plain" / CACHE_DIR).exists()
+
+    run_batch(export, tmp_path / "cached", backend=backend, cache_stages=True)
+    report = run_batch(export, tmp_path / "cached", backend=backend, resume=True, deadstock_threshold=0.3)
+
+    assert report["resumed_from"] == "score"
+    assert json.loads((tmp_path / "cached" / REPORT_FILE).read_text())["status"] == "succeeded"
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from logic.equivalence import ENGINES, assert_equivalent, generate_cases, generate_erp_frame, run_equivalence
+from logic.geography import build_distance_matrix
+from logic.ranking import get_redistribution_recommendations
+from logic.scoring import compute_deadstock_score
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engine_matches_reference(engine):
+    if engine == "duckdb":
+        pytest.importorskip("duckdb")
+    assert_equivalent(ENGINES[engine])
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engine_matches_reference_with_params(engine):
+    if engine == "duckdb":
+        pytest.importorskip("duckdb")
+    assert_equivalent(
+        ENGINES[engine],
+        cases=generate_cases(14, seed=1),
+        params={"deadstock_threshold": 0.3, "stock_weight": 0.8, "sell_through_weight": 0.2}
+    )
+
+
+def test_reference_errors_are_recorded_per_case():
+    def broken(df, **params):
+        raise RuntimeError("boom")
+
+    report = run_equivalence(ENGINES["scenario"], reference=broken, cases=generate_cases(3))
+
+    assert len(report) == 3
+    assert not report["equal"].any()
+    assert report["error"].str.contains("Reference failed: RuntimeError: boom").all()
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engine_matches_reference_with_forecast_demand(engine):
+    if engine == "duckdb":
+        pytest.importorskip("duckdb")
+    assert_equivalent(
+        ENGINES[engine],
+        cases=generate_cases(14, seed=2),
+        params={"demand_column": "forecast_daily_sales"},
+        atol=1e-6
+    )
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+def test_engine_matches_reference_with_partial_store_locations(engine):
+    if engine == "duckdb":
+        pytest.importorskip("duckdb")
+    # Stores 6-8 have no coordinates and must keep plain SKU matching
+    # Store 5 is alone in its region
+    locations = pd.DataFrame({
+        "Store": [f"Store {i}" for i in range(6)],
+        "Latitude": [52.0, 52.1, 52.3, 48.8, 48.9, 45.5],
+        "Longitude": [13.0, 13.2, 13.5, 2.3, 2.4, 9.2],
+        "Region": ["North", "North", "North", "South", "South", "West"]
+    })
+    assert_equivalent(
+        ENGINES[engine],
+        cases=generate_cases(14, seed=3),
+        params={"store_distances": build_distance_matrix(locations, k=2), "distance_weight": 0.9}
+    )
+
+
+def test_unlocated_stores_keep_plain_sku_matching():
+    rng = np.random.default_rng(4)
+    df = generate_erp_frame(rng, n_skus=3, n_stores=4, n_days=10)
+    locations = pd.DataFrame({"Store": ["Store 0", "Store 1"], "Latitude": [52.0, 48.8], "Longitude": [13.0, 2.3]})
+    scores = compute_deadstock_score(df)
+
+    plain = get_redistribution_recommendations(scores, deadstock_threshold=0)
+    located = get_redistribution_recommendations(
+        scores,
+        deadstock_threshold=0,
+        store_distances=build_distance_matrix(locations),
+        distance_weight=5
+    )
+
+    unlocated = ~(located["store_from"].isin(["Store 0", "Store 1"]) & located["store_to"].isin(["Store 0", "Store 1"]))
+    assert located.loc[unlocated, "distance_km"].isna().all()
+    assert len(located) == len(plain)
+    assert (located["transfer_score"] >= 0).all()
+
+
+def test_single_store_regions_are_not_paired_across_regions():
+    rng = np.random.default_rng(6)
+    df = generate_erp_frame(rng, n_skus=4, n_stores=5, n_days=10)
+    locations = pd.DataFrame({
+        "Store": ["Store 0", "Store 1", "Store 2", "Store 3"],
+        "Latitude": [52.0, 52.1, 48.8, 41.9],
+        "Longitude": [13.0, 13.2, 2.3, 12.5],
+        "Region": ["North", "North", "West", "South"]
+    })
+    region = dict(zip(locations["Store"], locations["Region"]))
+
+    recs = get_redistribution_recommendations(
+        compute_deadstock_score(df),
+        deadstock_threshold=0,
+        store_distances=build_distance_matrix(locations),
+        distance_weight=0.2
+    )
+
+    both_located = recs["store_from"].isin(region) & recs["store_to"].isin(region)
+    assert not recs.empty
+    assert (recs.loc[both_located, "store_from"].map(region) == recs.loc[both_located, "store_to"].map(region)).all()
+    # Store 4 has no coordinates: its pairs keep plain matching, at the maximum penalty
+    assert recs.loc[~both_located, ["store_from", "store_to"]].eq("Store 4").any(axis=1).all()
+    assert recs.loc[~both_located, "distance_km"].isna().all()
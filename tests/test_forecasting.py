@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from logic.forecasting import advance_forecast, fit_forecast, forecast_demand
+
+
+@pytest.fixture
+def daily():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2025-01-01", periods=40)
+    keys = [(f"SKU{i}", f"Store {j}") for i in range(5) for j in "ABC"]
+    df = pd.DataFrame(
+        [(date, sku, store) for date in dates for sku, store in keys],
+        columns=["Date", "SKU", "Store"]
+    )
+    df["Sales"] = rng.poisson(3, len(df))
+    # Gaps, and one series that only starts in the last days
+    df = df.drop(index=rng.choice(len(df), 60, replace=False))
+    late_starter = (df["SKU"] == "SKU0") & (df["Store"] == "Store A") & (df["Date"] < dates[-3])
+    return df[~late_starter].reset_index(drop=True)
+
+
+@pytest.mark.parametrize("batch_size", [4, 250_000])
+def test_advance_matches_a_full_fit(daily, batch_size):
+    cutoff = pd.Timestamp("2025-02-05")
+    state = fit_forecast(daily[daily["Date"] <= cutoff], batch_size=batch_size)
+    state = advance_forecast(state, daily[daily["Date"] > cutoff], batch_size=batch_size)
+
+    expected = forecast_demand(daily, batch_size=batch_size)
+    pd.testing.assert_frame_equal(state.forecast(), expected, check_exact=True)
+
+
+def test_advance_over_days_without_rows(daily):
+    state = fit_forecast(daily)
+    end = daily["Date"].max() + pd.Timedelta(days=5)
+    advanced = advance_forecast(state, daily.iloc[:0], end=end)
+
+    expected = forecast_demand(daily, date_range=(daily["Date"].min(), end))
+    pd.testing.assert_frame_equal(advanced.forecast(), expected, check_exact=True)
+    # The original state is left untouched
+    pd.testing.assert_frame_equal(state.forecast(), forecast_demand(daily), check_exact=True)
+
+
+def test_update_replaces_refitted_series(daily):
+    state = fit_forecast(daily)
+    date_range = (daily["Date"].min(), daily["Date"].max())
+    changed = daily.assign(Sales=np.where(daily["SKU"] == "SKU1", daily["Sales"] * 2, daily["Sales"]))
+
+    refit = fit_forecast(changed[changed["SKU"] == "SKU1"], date_range=date_range)
+    pd.testing.assert_frame_equal(state.update(refit).forecast(), forecast_demand(changed), check_exact=True)
+
+
+def test_advance_rejects_rows_inside_the_fitted_range(daily):
+    state = fit_forecast(daily)
+    with pytest.raises(ValueError, match="refit"):
+        advance_forecast(state, daily.tail(1))
+
+    short = fit_forecast(daily[daily["Date"] < "2025-01-04"])
+    with pytest.raises(ValueError, match="fewer than"):
+        advance_forecast(short, daily[daily["Date"] >= "2025-01-04"])
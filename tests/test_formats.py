@@ -0,0 +1,98 @@
+import gzip
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.formats import _ChunkSink, encode_table, iter_ndjson_gzip, negotiate_format
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def frame():
+	rng = np.random.default_rng(0)
+	return pd.DataFrame({
+		"SKU": [f"SKU{i:03d}" for i in range(10)],
+		"Store": ["Store A", "Store B"] * 5,
+		"transfer_score": rng.random(10),
+		"current_stock": rng.integers(0, 100, 10),
+	})
+
+
+def test_arrow_ipc_round_trip(frame):
+	data = b"".join(encode_table(frame, "arrow", batch_rows=3))
+	reader = pa.ipc.open_stream(data)
+
+	pd.testing.assert_frame_equal(reader.read_all().to_pandas(), frame)
+
+
+def test_parquet_round_trip_across_row_groups(frame):
+	data = b"".join(encode_table(frame, "parquet", batch_rows=3))
+	parquet = pq.ParquetFile(io.BytesIO(data))
+
+	# Footer offsets come from _ChunkSink.tell(); a wrong position breaks them
+	assert parquet.metadata.num_row_groups == 4
+	pd.testing.assert_frame_equal(parquet.read().to_pandas(), frame)
+
+
+def test_chunk_sink_position_survives_drains():
+	sink = _ChunkSink()
+	sink.write(b"abc")
+	assert sink.drain() == b"abc"
+	sink.write(b"de")
+
+	assert sink.tell() == 5
+	assert sink.drain() == b"de"
+
+
+def test_gzip_ndjson_round_trip(frame):
+	data = gzip.decompress(b"".join(iter_ndjson_gzip(frame, batch_rows=3)))
+	lines = data.decode("utf-8").splitlines()
+
+	assert len(lines) == len(frame)
+	decoded = pd.read_json(io.StringIO(data.decode("utf-8")), lines=True, dtype=False)
+	pd.testing.assert_frame_equal(decoded, frame, check_dtype=False, rtol=0, atol=1e-15)
+
+
+def test_gzip_ndjson_empty_frame(frame):
+	assert gzip.decompress(b"".join(iter_ndjson_gzip(frame.head(0)))) == b""
+
+
+@pytest.mark.parametrize("fmt, accept, expected", [
+	(None, None, "json"),
+	(None, "application/vnd.apache.arrow.stream", "arrow"),
+	(None, "application/x-parquet;q=0.9, application/json", "parquet"),
+	(None, "text/html, application/jsonlines", "ndjson"),
+	(None, "text/html", "json"),
+	("Parquet", "application/vnd.apache.arrow.stream", "parquet"),
+])
+def test_negotiate_format(fmt, accept, expected):
+	assert negotiate_format(fmt, accept) == expected
+
+
+def test_negotiate_format_rejects_unknown_format():
+	with pytest.raises(ValueError, match="Unsupported format"):
+		negotiate_format("xml", None)
+
+
+def test_api_honours_accept_header(frame, monkeypatch):
+	pytest.importorskip("httpx")
+	TestClient = pytest.importorskip("fastapi.testclient").TestClient
+
+	import app.api as api
+
+	monkeypatch.setattr(api, "_current_results", lambda: (frame, frame))
+	client = TestClient(api.app)
+
+	response = client.get("/scores", headers={"Accept": "application/vnd.apache.arrow.stream"})
+	assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+	pd.testing.assert_frame_equal(pa.ipc.open_stream(response.content).read_all().to_pandas(), frame)
+
+	response = client.get("/scores", params={"format": "ndjson"}, headers={"Accept": "application/json"})
+	assert response.headers["content-encoding"] == "gzip"
+	assert len(response.text.splitlines()) == len(frame)
+
+	assert client.get("/scores", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from logic.history import diff_versions, list_versions, load_history, record_history, summarise_diff
+
+pytest.importorskip("pyarrow")
+
+
+def _recs(rows):
+    return pd.DataFrame(rows, columns=["SKU", "store_from", "store_to", "transfer_score"])
+
+
+@pytest.fixture
+def history(tmp_path):
+    record_history(tmp_path, "v1", {"recommendations": _recs([
+        ("SKU1", "Store A", "Store B", 0.9),
+        ("SKU1", "Store A", "Store C", 0.5),
+        ("SKU2", "Store B", "Store A", 0.4),
+        ("SKU3", "Store C", "Store A", 0.3),
+    ])})
+    record_history(tmp_path, "v2", {"recommendations": _recs([
+        ("SKU1", "Store A", "Store B", 0.9),            # unchanged
+        ("SKU1", "Store A", "Store C", 0.2),            # changed by -0.3
+        ("SKU2", "Store B", "Store A", 0.4 + 1e-12),    # below atol
+        ("SKU4", "Store A", "Store C", 0.7),            # added
+    ])})                                                # SKU3 dropped
+    return tmp_path
+
+
+def test_record_history_lists_versions_once(history):
+    assert list(list_versions(history)["version"]) == ["v1", "v2"]
+    assert record_history(history, "v2", {"recommendations": _recs([])}) is False
+    assert list(load_history(history, "v1")["transfer_score"]) == [0.9, 0.5, 0.4, 0.3]
+
+
+def test_diff_reports_added_dropped_and_changed_rows(history):
+    diff = diff_versions(history, "v1", "v2")
+    rows = {tuple(r[:3]): r for r in diff.itertuples(index=False)}
+
+    assert summarise_diff(diff) == {"added": 1, "dropped": 1, "changed": 1}
+    assert rows[("SKU4", "Store A", "Store C")].change == "added"
+    assert rows[("SKU3", "Store C", "Store A")].change == "dropped"
+    changed = rows[("SKU1", "Store A", "Store C")]
+    assert changed.change == "changed"
+    assert changed.delta == pytest.approx(-0.3)
+
+
+def test_diff_atol_filters_small_moves(history):
+    diff = diff_versions(history, "v1", "v2", atol=0)
+
+    assert summarise_diff(diff)["changed"] == 2
+    assert ("SKU2", "Store B", "Store A") in set(map(tuple, diff[["SKU", "store_from", "store_to"]].to_numpy()))
+
+
+def test_diff_against_an_empty_version(history):
+    record_history(history, "v3", {"recommendations": _recs([])})
+
+    dropped = diff_versions(history, "v2", "v3")
+    added = diff_versions(history, "v3", "v2")
+
+    assert summarise_diff(dropped) == {"added": 0, "dropped": 4, "changed": 0}
+    assert summarise_diff(added) == {"added": 4, "dropped": 0, "changed": 0}
+    assert summarise_diff(diff_versions(history, "v3", "v3")) == {"added": 0, "dropped": 0, "changed": 0}
@@ -0,0 +1,20 @@
+import pytest
+
+from app.import_budget import BUDGETS, PROJECT_ROOT, SCRIPT_BUDGETS, measure_import, measure_script
+from app.settings import DATA_PATH
+
+
+@pytest.mark.parametrize("budget", BUDGETS, ids=lambda b: b.module)
+def test_module_import_budget(budget):
+	report = measure_import(budget.module)
+	assert report.violations(budget) == []
+
+
+@pytest.mark.parametrize("budget", SCRIPT_BUDGETS, ids=lambda b: b.module)
+def test_script_render_budget(budget):
+	pytest.importorskip("streamlit")
+	if not (PROJECT_ROOT / DATA_PATH).exists():
+		pytest.skip(f"Sample dataset not found at {DATA_PATH}")
+
+	report = measure_script(budget.module)
+	assert report.violations(budget) == []
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from logic.preprocessing import load_inventory
+from logic.reconciliation import reconcile_inventory, reconcile_inventory_csv
+
+
+@pytest.fixture
+def export(tmp_path):
+    rows = []
+    for store in ["Store A", "Store B"]:
+        for sku in ["SKU1", "SKU2"]:
+            stock = 50
+            for day in range(12):
+                # Store B / SKU2 skips a day
+                if (store, sku, day) == ("Store B", "SKU2", 6):
+                    continue
+                opening = stock
+                sales, replenishment = day % 3, 2 if day % 4 == 0 else 0
+                closing = opening + replenishment - sales
+                rows.append({
+                    "Date": pd.Timestamp("2025-01-01") + pd.Timedelta(days=day),
+                    "Store": store,
+                    "SKU": sku,
+                    "Opening_Stock": opening,
+                    "Replenishment": replenishment,
+                    "Sales": sales,
+                    "Closing_Stock": closing
+                })
+                stock = closing
+
+    df = pd.DataFrame(rows).sort_values(["Date", "Store", "SKU"], ignore_index=True)
+    # A balance mismatch, and a continuity break on the day after it
+    df.loc[(df["Store"] == "Store A") & (df["SKU"] == "SKU1") & (df["Date"] == "2025-01-05"), "Closing_Stock"] += 3
+    # A day shifted by 4 units: breaks continuity on both of its edges
+    df.loc[(df["Store"] == "Store B") & (df["SKU"] == "SKU1") & (df["Date"] == "2025-01-09"), "Opening_Stock"] += 4
+    df.loc[(df["Store"] == "Store B") & (df["SKU"] == "SKU1") & (df["Date"] == "2025-01-09"), "Closing_Stock"] += 4
+
+    path = tmp_path / "erp.csv"
+    df.assign(Date=df["Date"].dt.strftime("%Y-%m-%d")).to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize("chunksize", [1, 3, 7, 1000])
+def test_chunked_reconciliation_matches_in_memory(export, chunksize):
+    expected = reconcile_inventory(load_inventory(str(export)))
+    streamed = reconcile_inventory_csv(export, chunksize=chunksize)
+
+    assert streamed.totals == expected.totals
+    pd.testing.assert_frame_equal(streamed.by_store.sort_index(), expected.by_store.sort_index(), check_like=True)
+    pd.testing.assert_frame_equal(streamed.by_sku.sort_index(), expected.by_sku.sort_index(), check_like=True)
+
+
+def test_reconciliation_counts_breaks_and_missing_days(export):
+    totals = reconcile_inventory(load_inventory(str(export))).totals
+
+    assert totals["balance_mismatches"] == 1
+    assert totals["balance_abs_delta"] == 3
+    # The day after the mismatch, plus the shifted day and the day after it
+    assert totals["continuity_breaks"] == 3
+    assert totals["continuity_abs_delta"] == 3 + 4 + 4
+    assert totals["missing_days"] == 1
@@ -0,0 +1,20 @@
+import numpy as np
+import pandas as pd
+
+from logic.sketches import approximate_kpis, build_partition_sketches
+
+
+def test_approximate_kpis_are_deterministic():
+    rng = np.random.default_rng(0)
+    n = 50_000
+    scores = pd.DataFrame({
+        "SKU": rng.integers(0, 2000, n).astype(str),
+        "Store": rng.integers(0, 12, n).astype(str),
+        "current_stock": rng.gamma(2.0, 30.0, n),
+        "sell_through_rate": rng.random(n)
+    })
+
+    first, second = (approximate_kpis(build_partition_sketches(scores)) for _ in range(2))
+
+    assert first["median_stock"] == second["median_stock"]
+    assert np.array_equal(first["stock_histogram"][0], second["stock_histogram"][0])
@@ -0,0 +1,90 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from logic.snapshot import (
+    STAGING_PREFIX,
+    STALE_STAGING_SECONDS,
+    VERSIONS_DIR,
+    SnapshotReader,
+    current_version,
+    read_manifest,
+    read_table,
+    write_snapshot,
+)
+
+pytest.importorskip("pyarrow")
+
+
+def _frames(score):
+    return {
+        "scores": pd.DataFrame({"SKU": ["SKU1", "SKU2"], "Store": ["Store A", "Store B"], "deadstock_score": [score, 0.25]}),
+        "recommendations": pd.DataFrame({"SKU": ["SKU1"], "store_from": ["Store A"], "store_to": ["Store B"], "transfer_score": [score]}),
+    }
+
+
+def _versions(root):
+    return sorted(p.name for p in (root / VERSIONS_DIR).iterdir() if not p.name.startswith("."))
+
+
+def test_write_and_read_round_trip(tmp_path):
+    assert current_version(tmp_path) is None
+    with pytest.raises(FileNotFoundError):
+        read_table(tmp_path, "scores")
+
+    version = write_snapshot(tmp_path, _frames(0.5), metadata={"source": "export.csv"}, history=False)
+
+    assert current_version(tmp_path) == version
+    manifest = read_manifest(tmp_path)
+    assert manifest["source"] == "export.csv"
+    assert manifest["tables"]["scores"] == {"rows": 2, "columns": ["SKU", "Store", "deadstock_score"]}
+
+    scores = read_table(tmp_path, "scores")
+    pd.testing.assert_frame_equal(scores, _frames(0.5)["scores"], check_dtype=False)
+    assert list(read_table(tmp_path, "scores", version, columns=["SKU"]).columns) == ["SKU"]
+
+
+def test_old_versions_stay_readable_by_id_until_pruned(tmp_path):
+    first = write_snapshot(tmp_path, _frames(0.5), keep=2, history=False)
+    second = write_snapshot(tmp_path, _frames(0.75), keep=2, history=False)
+
+    assert current_version(tmp_path) == second
+    assert read_table(tmp_path, "scores", first)["deadstock_score"][0] == 0.5
+    assert read_table(tmp_path, "scores")["deadstock_score"][0] == 0.75
+
+    third = write_snapshot(tmp_path, _frames(1.0), keep=2, history=False)
+    assert _versions(tmp_path) == sorted([second, third])
+    with pytest.raises(FileNotFoundError):
+        read_table(tmp_path, "scores", first)
+
+
+def test_reader_follows_the_current_version(tmp_path):
+    reader = SnapshotReader(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        reader.table("scores")
+
+    first = write_snapshot(tmp_path, _frames(0.5), history=False)
+    assert reader.table("scores")["deadstock_score"][0] == 0.5
+    assert reader.version == first
+    assert reader.has_table("recommendations") and not reader.has_table("store_distances")
+
+    write_snapshot(tmp_path, _frames(0.75), history=False)
+    assert reader.table("scores")["deadstock_score"][0] == 0.75
+    assert reader.refresh() is False
+
+
+def test_stale_staging_is_removed_and_fresh_staging_kept(tmp_path):
+    versions = tmp_path / VERSIONS_DIR
+    stale = versions / f"{STAGING_PREFIX}stale"
+    fresh = versions / f"{STAGING_PREFIX}fresh"
+    stale.mkdir(parents=True)
+    fresh.mkdir()
+    old = time.time() - STALE_STAGING_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    write_snapshot(tmp_path, _frames(0.5), history=False)
+
+    assert not stale.exists()
+    assert fresh.exists()
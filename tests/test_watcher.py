@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from logic.watcher import IncrementalDataset
+
+
+def _export(dates, store="store a", sku="sku1"):
+    return pd.DataFrame({
+        "Date": dates,
+        "Store": store,
+        "Region": "north",
+        "SKU": sku,
+        "Category": "apparel",
+        "Opening_Stock": 10,
+        "Replenishment": 0,
+        "Sales": 1,
+        "Closing_Stock": 9
+    })
+
+
+def test_duplicates_are_detected_across_csv_and_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    _export(["2025-01-01", "2025-01-02"]).to_csv(tmp_path / "2025-01-01.csv", index=False)
+    dataset = IncrementalDataset(tmp_path)
+    dataset.rebuild()
+
+    # Same Date + Store + SKU, but as a Parquet datetime with different casing
+    duplicate = _export(pd.to_datetime(["2025-01-02"]), store=" Store A", sku="SKU1 ")
+    duplicate.to_parquet(tmp_path / "2025-01-02.parquet", index=False)
+
+    with pytest.raises(ValueError, match="Duplicate records"):
+        dataset.ingest([tmp_path / "2025-01-02.parquet"])
+
+
+def test_new_parquet_rows_are_ingested(tmp_path):
+    pytest.importorskip("pyarrow")
+    _export(["2025-01-01"]).to_csv(tmp_path / "2025-01-01.csv", index=False)
+    dataset = IncrementalDataset(tmp_path)
+    dataset.rebuild()
+
+    _export(pd.to_datetime(["2025-01-02"])).to_parquet(tmp_path / "2025-01-02.parquet", index=False)
+    delta = dataset.ingest([tmp_path / "2025-01-02.parquet"])
+
+    assert len(delta) == 1
+    assert len(dataset.inventory) == 2
+
+
+def test_nightly_drop_advances_the_forecast(tmp_path):
+    from logic.forecasting import forecast_demand
+
+    days = pd.date_range("2025-01-01", periods=14).strftime("%Y-%m-%d")
+    first = pd.concat([_export(days), _export(days, store="store b")])
+    first["Sales"] = [3, 1, 4, 1, 5, 9, 2, 6, 5, 3, 5, 8, 9, 7] * 2
+    first.to_csv(tmp_path / "2025-01-14.csv", index=False)
+    dataset = IncrementalDataset(tmp_path)
+    dataset.rebuild()
+    dataset.tables()
+
+    # Next day, plus a series first seen in this drop
+    drop = pd.concat([_export(["2025-01-15"]), _export(["2025-01-15"], sku="sku2")])
+    drop.to_csv(tmp_path / "2025-01-15.csv", index=False)
+    dataset.ingest([tmp_path / "2025-01-15.csv"])
+
+    expected = forecast_demand(dataset.inventory)
+    pd.testing.assert_frame_equal(dataset.forecast.reset_index(drop=True), expected, check_exact=True)